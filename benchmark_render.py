@@ -0,0 +1,144 @@
+import os, sys, time, json, argparse, itertools, statistics, tracemalloc, contextlib
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from modules.protocol import *
+
+# Rendering benchmark: drives baselineScene, trainingScene and gameScene of the headless widget through
+# every stage for every combination of three task types, rendering N frames per stage.
+#
+#   python benchmark_render.py --frames 60 -o render.json
+#
+# For each scene and stage the report holds the frame time (paintGL up to glFinish) as mean/p95/p99 in ms,
+# the GL calls per frame, and the Python allocations of a few extra frames traced with tracemalloc:
+# the peak bytes allocated during the frame and the blocks still alive after it.
+# Stages of the training and game scenes are keyed without the task name, e.g. 'cue_<task>'.
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+STAGE_KEYS = {BASELINE_CUE: 'cue', FIXATION: 'fixation', CUE_REST: 'cue_rest', REST: 'rest', CUE_TASK: 'cue_<task>', TASK: '<task>', BREAK: 'break'}
+
+class NullOutlet:
+    # takes the stage markers of the benchmark, so none of them reach a recording on the network
+    def push_sample(self, sample, timestamp=0.):
+        pass
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100. * (len(values) - 1))))]
+
+def sessionProtocol(widget, scene, tasks):
+    if scene == 'baseline':
+        return compileBaseline(widget.baseline_cue_duration, widget.baseline_duration)
+    # one trial per task column
+    return compileTrials(list(tasks), [0, 1, 2], widget.cue_duration, widget.task_duration, widget.break_duration, widget.word_categories)
+
+def renderStage(widget, index, frames, alloc_frames):
+    widget.enterStage(index)
+    # every task of the run is warmed up before its stages, keep the warm-up out of the rest frame times
+    widget.warm_up_pending = False
+    if widget.scene == GAME_SCENE and widget.stage_kind == TASK:
+        # the prediction is correct, the rocket of the trial launches in the break
+        widget.current_task = widget.stage_column
+
+    times, calls = [], []
+    for i in range(frames):
+        start = time.perf_counter()
+        widget.renderFrame()
+        times.append(time.perf_counter() - start)
+        calls.append(widget.gl_state.last_frame_calls)
+
+    peak_bytes, retained_blocks = [], []
+    tracemalloc.start()
+    for i in range(alloc_frames):
+        tracemalloc.clear_traces()
+        widget.renderFrame()
+        peak_bytes.append(tracemalloc.get_traced_memory()[1])
+        retained_blocks.append(len(tracemalloc.take_snapshot().traces))
+    tracemalloc.stop()
+    return times, calls, peak_bytes, retained_blocks
+
+def summarize(samples):
+    times = [t * 1000. for t in samples['times']]
+    summary = {
+        'frames': len(times),
+        'mean_ms': statistics.mean(times),
+        'p95_ms': percentile(times, 95),
+        'p99_ms': percentile(times, 99),
+        'max_ms': max(times),
+        'gl_calls': statistics.mean(samples['calls']),
+    }
+    if samples['peak_bytes']:
+        summary['alloc_peak_bytes'] = statistics.mean(samples['peak_bytes'])
+        summary['alloc_retained_blocks'] = statistics.mean(samples['retained_blocks'])
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure frame time, GL calls and allocations of every scene and stage rendered offscreen')
+    parser.add_argument('--frames', type=int, default=30, help='timed frames per stage and task combination')
+    parser.add_argument('--alloc-frames', type=int, default=3, help='frames traced for allocations per stage and task combination')
+    parser.add_argument('--combinations', type=int, default=None, help='only run the first n task combinations')
+    parser.add_argument('--size', default='1280x720', help='frame size, WIDTHxHEIGHT')
+    parser.add_argument('-o', '--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    os.chdir(repo_dir)
+    sys.path.insert(0, repo_dir)
+    import main as app_main
+    from modules import QApplication
+    from modules.offscreenwidget import OffscreenOGLWidget
+    from OpenGL.GL import glGetString, GL_RENDERER
+    from benchmark_startup import gitCommit
+
+    app = QApplication(sys.argv[:1])
+    window = app_main.MainWindow()
+    size = tuple(int(x) for x in args.size.split('x'))
+    # the widget opens its marker outlet under the configured name, keep it apart from a live session
+    # until the outlet is replaced
+    window.ui.lsl_marker_outlet_lineEdit.setText('BCI Rocket Render Benchmark')
+    widget = OffscreenOGLWidget(window, window.image_loader, size)
+    widget.stream_outlet = NullOutlet()
+    widget.makeCurrent()
+    gl_renderer = glGetString(GL_RENDERER).decode()
+    widget.doneCurrent()
+    ui = window.ui
+    task_types = [ui.task1_comboBox.itemText(i) for i in range(ui.task1_comboBox.count())]
+    combinations = list(itertools.combinations(task_types, 3))[:args.combinations]
+
+    samples = {}
+    def record(scene, key, result):
+        entry = samples.setdefault(scene, {}).setdefault(key, {'times': [], 'calls': [], 'peak_bytes': [], 'retained_blocks': []})
+        for name, values in zip(['times', 'calls', 'peak_bytes', 'retained_blocks'], result):
+            entry[name] += values
+
+    start = time.perf_counter()
+    runs = [('baseline', combinations[0])] + [(scene, tasks) for tasks in combinations for scene in ['training', 'game']]
+    scenes = {'baseline': BASELINE_SCENE, 'training': TRAINING_SCENE, 'game': GAME_SCENE}
+    # the widget prints its stage transitions, keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        for scene, tasks in runs:
+            widget.loadProtocol(scenes[scene], sessionProtocol(widget, scene, tasks))
+            widget.prefetchTextures(list(tasks))
+            for index in range(len(widget.protocol)):
+                record(scene, STAGE_KEYS[widget.protocol.kinds[index]], renderStage(widget, index, args.frames, args.alloc_frames))
+
+    report = {
+        'commit': gitCommit(),
+        'renderer': widget.renderer,
+        'gl_renderer': gl_renderer,
+        'size': list(size),
+        'frames_per_stage': args.frames,
+        'combinations': len(combinations),
+        'duration': time.perf_counter() - start,
+        'scenes': {scene: {key: summarize(entry) for key, entry in stages.items()} for scene, stages in samples.items()},
+    }
+    report['total'] = {scene: summarize({name: sum((entry[name] for entry in stages.values()), []) for name in ['times', 'calls', 'peak_bytes', 'retained_blocks']})
+                       for scene, stages in samples.items()}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import os, sys, time, json, argparse, subprocess, statistics
+
+# Startup benchmark: launches MainWindow under an offscreen Qt platform in a fresh interpreter per run
+# and records when each startup phase starts and ends, relative to the start of the imports.
+#
+#   python benchmark_startup.py --runs 5 -o startup.json
+#
+# The report holds the per-run phase timeline, the median duration of each phase and an
+# import-time breakdown from python -X importtime. A run that times out or misses a phase, e.g. because
+# the platform has no OpenGL context (the offscreen platform needs an X server, see xvfb-run), is
+# marked as failed and the benchmark exits with status 1.
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+PHASES = ['imports', 'setupUi', 'game_imports', 'OGLWidget.__init__', 'initializeGL', 'first_paintGL']
+
+def child(timeout):
+    os.chdir(repo_dir)
+    t0 = time.perf_counter()
+    timeline = {}
+
+    def mark(phase, start, end):
+        if phase not in timeline:
+            timeline[phase] = {'start': start - t0, 'end': end - t0}
+
+    def timed(phase, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            mark(phase, start, time.perf_counter())
+            return result
+        return wrapper
+
+    import main
+    from modules import QApplication, QTimer, Ui_MainWindow
+    mark('imports', t0, time.perf_counter())
+    Ui_MainWindow.setupUi = timed('setupUi', Ui_MainWindow.setupUi)
+
+    app = QApplication(sys.argv[:1])
+    result = {'timeline': timeline}
+
+    def finish(timed_out=False):
+        if 'home_page_shown' in result:
+            return
+        result['home_page_shown'] = getattr(window, 'startup_time', None)
+        result['timed_out'] = timed_out
+        app.quit()
+
+    setup_game = main.MainWindow.setupGame
+    def setupGame(self):
+        if main.widgets.oglWidget is not None:
+            return
+        start = time.perf_counter()
+        import modules.oglwidget
+        mark('game_imports', start, time.perf_counter())
+        OGLWidget = modules.oglwidget.OGLWidget
+        OGLWidget.__init__ = timed('OGLWidget.__init__', OGLWidget.__init__)
+        OGLWidget.initializeGL = timed('initializeGL', OGLWidget.initializeGL)
+        paint = OGLWidget.paintGL
+        def paintGL(widget):
+            start = time.perf_counter()
+            paint(widget)
+            mark('first_paintGL', start, time.perf_counter())
+            QTimer.singleShot(0, finish)
+        OGLWidget.paintGL = paintGL
+        setup_game(self)
+        # show the game page so the widget initializes GL and paints its first frame
+        main.widgets.stackedWidget.setCurrentWidget(main.widgets.game_page)
+    main.MainWindow.setupGame = setupGame
+
+    window = main.MainWindow()
+    QTimer.singleShot(int(timeout * 1000), lambda: finish(True))
+    app.exec_()
+    print(json.dumps(result))
+
+def parseImportTimes(stderr, top):
+    # lines look like "import time:  self [us] | cumulative | imported package", nesting is indentation
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.startswith('  '):
+            continue
+        name = name.strip()
+        packages[name] = {'self_us': int(self_us), 'cumulative_us': int(cumulative_us)}
+    ranked = sorted(packages.items(), key=lambda item: item[1]['cumulative_us'], reverse=True)
+    return dict(ranked[:top])
+
+def gitCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=repo_dir, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the time python main.py takes to reach the home page and the game widget')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--platform', default='offscreen', help='QT_QPA_PLATFORM used for the runs')
+    parser.add_argument('--timeout', type=float, default=30., help='seconds before a run is abandoned')
+    parser.add_argument('--top', type=int, default=25, help='number of top-level imports in the breakdown')
+    parser.add_argument('-o', '--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 when the home page misses the startup budget')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.timeout)
+        return
+
+    env = dict(os.environ, QT_QPA_PLATFORM=args.platform)
+    runs = []
+    imports = None
+    for i in range(args.runs):
+        process = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child', '--timeout', str(args.timeout)],
+                                 cwd=repo_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        lines = [line for line in process.stdout.splitlines() if line.startswith('{')]
+        if process.returncode != 0 or not lines:
+            sys.stderr.write(process.stderr[-2000:])
+            raise SystemExit('startup run %d failed with status %d' % (i, process.returncode))
+        run = json.loads(lines[-1])
+        run['missing_phases'] = [phase for phase in PHASES if phase not in run['timeline']]
+        run['failed'] = run['timed_out'] or run['home_page_shown'] is None or bool(run['missing_phases'])
+        if run['failed']:
+            sys.stderr.write('startup run %d failed, missing phases: %s\n' % (i, ', '.join(run['missing_phases']) or 'none'))
+        runs.append(run)
+        if imports is None:
+            imports = parseImportTimes(process.stderr, args.top)
+
+    phases = {}
+    for run in runs:
+        for phase, span in run['timeline'].items():
+            phases.setdefault(phase, []).append(span['end'] - span['start'])
+    shown = [run['home_page_shown'] for run in runs if run.get('home_page_shown') is not None]
+
+    budget = float(os.environ.get('BCI_ROCKET_STARTUP_BUDGET', 1.0))
+    report = {
+        'commit': gitCommit(),
+        'platform': args.platform,
+        'runs': runs,
+        'median_duration': {phase: statistics.median(durations) for phase, durations in phases.items()},
+        'median_home_page_shown': statistics.median(shown) if shown else None,
+        'startup_budget': budget,
+        'failed_runs': sum(run['failed'] for run in runs),
+        'imports': imports,
+    }
+    report['within_budget'] = report['median_home_page_shown'] is not None and report['median_home_page_shown'] <= budget
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    if report['failed_runs'] or (args.check and not report['within_budget']):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
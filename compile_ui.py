@@ -1,15 +1,34 @@
-import os
+import os, ast, struct
 
 orig_ui_file_path = 'main.ui'
 ui_file_path = 'modules/ui_main.py'
+rcc_file_path = 'modules/resources.rcc'
 
 # compile .ui file
 cmd = 'pyuic5 ' + orig_ui_file_path + ' > ' + ui_file_path
 os.system(cmd)
 
-# compile .qrc file
-cmd = 'pyrcc5 resources.qrc -o modules/resources_rc.py'
+# compile .qrc file into a binary resource bundle, modules/resources_rc.py registers it at runtime
+# pyrcc5 only emits python, so its resource tables are repacked into the rcc binary format (version 2)
+tmp_rc_file_path = 'resources_rc_tmp.py'
+cmd = 'pyrcc5 resources.qrc -o ' + tmp_rc_file_path
 os.system(cmd)
+tables = {}
+for node in ast.parse(open(tmp_rc_file_path, encoding='utf-8').read()).body:
+    # bytes literals are ast.Bytes before python 3.8 and ast.Constant after, literal_eval reads both
+    if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name) and node.targets[0].id.startswith('qt_resource_'):
+        tables[node.targets[0].id] = ast.literal_eval(node.value)
+os.remove(tmp_rc_file_path)
+data, names, tree = tables['qt_resource_data'], tables['qt_resource_name'], tables['qt_resource_struct_v2']
+data_offset = 20
+names_offset = data_offset + len(data)
+tree_offset = names_offset + len(names)
+f = open(rcc_file_path, 'wb')
+f.write(b'qres' + struct.pack('>IIII', 2, tree_offset, data_offset, names_offset))
+f.write(data)
+f.write(names)
+f.write(tree)
+f.close()
 print('Compiled resources (.qrc) file')
 
 # change encoding to utf-8 and update resources path
@@ -21,4 +40,4 @@ f = open(ui_file_path, 'w', encoding='utf-8')
 f.write(content)
 f.close()
 
-print("Compiled UI (.ui) file")
\ No newline at end of file
+print("Compiled UI (.ui) file")
@@ -1,12 +1,34 @@
-import sys
+import time
+startup_start = time.perf_counter()
+import sys, os, importlib
 import math, random
 from modules import *
 
+# time from the first import to an interactive home page, in seconds
+startup_budget = float(os.environ.get('BCI_ROCKET_STARTUP_BUDGET', 1.0))
+
+# headless mode renders the scenes offscreen, frames are saved as PNG files when a dump directory is set.
+# BCI_ROCKET_HEADLESS_SESSION runs sessions without any input, e.g. 'baseline' or 'training,game,game',
+# one after the other, and quits after the last one. the offscreen platform of Qt 5 gets its OpenGL
+# context through GLX, so it needs an X server, without a display run it under one:
+#   BCI_ROCKET_HEADLESS=1 BCI_ROCKET_HEADLESS_SESSION=training xvfb-run -a python main.py
+headless = os.environ.get('BCI_ROCKET_HEADLESS', '0') == '1'
+headless_size = tuple(int(x) for x in os.environ.get('BCI_ROCKET_HEADLESS_SIZE', '1280x720').split('x'))
+headless_sessions = [s for s in os.environ.get('BCI_ROCKET_HEADLESS_SESSION', '').split(',') if s]
+frame_dump_dir = os.environ.get('BCI_ROCKET_FRAME_DUMP_DIR')
+
 widgets = None
 
 class MainWindow(QMainWindow):
+    game_module_imported = pyqtSignal()
+    pause_toggled = pyqtSignal(bool)
+
     def __init__(self):
         QMainWindow.__init__(self)
+
+        # start decoding the sprites on worker threads while the UI is set up
+        self.image_loader = ImageLoader()
+        self.image_loader.prefetch(COMMON_SPRITES)
         
         # SET AS GLOBAL WIDGETS
         self.ui = Ui_MainWindow()
@@ -29,9 +51,9 @@ class MainWindow(QMainWindow):
         #     w.textChanged.connect(self.changeSettings)
         # self.settings_valid = True
 
-        # setup opengl widget
-        widgets.oglWidget = OGLWidget(self)
-        widgets.game_frame.layout().addWidget(widgets.oglWidget)
+        # the opengl widget is built once the home page is up, see setupGame
+        self.image_loader.prefetch(requiredSprites([widgets.task1_comboBox.currentText(), widgets.task2_comboBox.currentText(), widgets.task3_comboBox.currentText()]))
+        widgets.oglWidget = None
 
         # setup
         self.settings_lineEdits = [widgets.num_trials_lineEdit, widgets.lsl_marker_outlet_lineEdit, widgets.lsl_prediction_inlet_lineEdit]
@@ -43,6 +65,54 @@ class MainWindow(QMainWindow):
 
         widgets.num_trials_lineEdit.setText('6')
 
+        # runs after the pending paint events, i.e. once the home page is on screen
+        self.game_module_imported.connect(self.setupGame)
+        QTimer.singleShot(0, self.homePageShown)
+
+    def homePageShown(self):
+        self.startup_time = time.perf_counter() - startup_start
+        print('Home page shown after %.3f s (budget %.3f s)' % (self.startup_time, startup_budget))
+        if self.startup_time > startup_budget:
+            print('WARNING: startup exceeded its budget by %.3f s' % (self.startup_time - startup_budget))
+
+        # import PyOpenGL, pylsl and NumPy in the background, the widget is built when that is done
+        future = self.image_loader.executor.submit(importlib.import_module, 'modules.oglwidget')
+        future.add_done_callback(lambda f: self.game_module_imported.emit())
+
+    def setupGame(self):
+        # also called on first entry to game_page in case the background import has not finished yet
+        if widgets.oglWidget is not None:
+            return
+        if headless:
+            from modules.offscreenwidget import OffscreenOGLWidget
+            widgets.oglWidget = OffscreenOGLWidget(self, self.image_loader, headless_size, frame_dump_dir)
+            if headless_sessions:
+                # queued, the next session starts after the stopped one has returned to the event loop
+                widgets.oglWidget.session_stopped.connect(self.nextHeadlessSession, Qt.QueuedConnection)
+                QTimer.singleShot(0, self.nextHeadlessSession)
+        else:
+            from modules.oglwidget import OGLWidget
+            widgets.oglWidget = OGLWidget(self, self.image_loader)
+            widgets.game_frame.layout().addWidget(widgets.oglWidget)
+        self.pause_toggled.connect(widgets.oglWidget.setPauseRequested)
+
+    def nextHeadlessSession(self):
+        # starts the next session of BCI_ROCKET_HEADLESS_SESSION, quits when all have run
+        if not headless_sessions:
+            QApplication.quit()
+            return
+        session = headless_sessions.pop(0)
+        print('headless session: %s' % session)
+        if session == 'baseline':
+            self.startBaseline()
+        elif session == 'training':
+            self.startTraining()
+        elif session == 'game':
+            self.startGame()
+        else:
+            print('Unknown headless session: %s' % session)
+            QApplication.exit(1)
+
     def buttonClick(self):
         btn = self.sender()
         btnName = btn.objectName()
@@ -58,6 +128,7 @@ class MainWindow(QMainWindow):
         elif btnName == 'btn_save_settings':
             self.saveSettings()
         elif btnName == 'btn_back':
+            self.setupGame()
             widgets.oglWidget.stop()
             widgets.stackedWidget.setCurrentWidget(widgets.home_page)
         elif btnName == 'btn_pause':
@@ -67,6 +138,7 @@ class MainWindow(QMainWindow):
                 widgets.btn_pause.setText('Pause')
             elif widgets.btn_pause.text() == 'Resume':
                 widgets.btn_pause.setText('Pause')
+            self.pause_toggled.emit(widgets.btn_pause.text() == 'Pausing...')
 
     def saveSettings(self):
         self.settings_valid = True
@@ -91,21 +163,26 @@ class MainWindow(QMainWindow):
             widgets.btn_save_settings.setText('Save')
             widgets.btn_save_settings.setEnabled(True)
             widgets.stackedWidget.setCurrentWidget(widgets.home_page)
+            if widgets.oglWidget is not None:
+                widgets.oglWidget.prefetchTextures()
         else:
             widgets.btn_save_settings.setText('Save - Invalid Settings')
             widgets.btn_save_settings.setEnabled(True)
 
     def startBaseline(self):
         print('start baseline')
+        self.setupGame()
         widgets.stackedWidget.setCurrentWidget(widgets.game_page)
         widgets.oglWidget.startBaseline(self)
 
     def startTraining(self):
         print('start training')
+        self.setupGame()
         widgets.stackedWidget.setCurrentWidget(widgets.game_page)
         widgets.oglWidget.startTraining(self)
 
     def startGame(self):
+        self.setupGame()
         widgets.stackedWidget.setCurrentWidget(widgets.game_page)
         widgets.oglWidget.startGame(self)
 
@@ -119,6 +196,14 @@ class MainWindow(QMainWindow):
                 widgets.oglWidget.selectTask(2)
 
 if __name__ == "__main__":
+    # swap interval of the frame loop in display refreshes, 0 disables vsync
+    surface_format = QSurfaceFormat.defaultFormat()
+    surface_format.setSwapInterval(int(os.environ.get('BCI_ROCKET_SWAP_INTERVAL', 1)))
+    QSurfaceFormat.setDefaultFormat(surface_format)
+    if headless:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        if os.environ['QT_QPA_PLATFORM'].startswith('offscreen') and not os.environ.get('DISPLAY'):
+            sys.exit('Headless mode needs an X server for its OpenGL context, run it under xvfb-run -a')
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("bci_rocket.ico"))
     window = MainWindow()
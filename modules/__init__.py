@@ -4,4 +4,14 @@ from PyQt5.QtWidgets import *
 
 # GUI FILE
 from . ui_main import Ui_MainWindow
-from . oglwidget import OGLWidget
\ No newline at end of file
+from . imageloader import ImageLoader, COMMON_SPRITES, requiredSprites
+
+# the GL widgets pull in PyOpenGL, pylsl and NumPy, so it is only imported on first use
+def __getattr__(name):
+    if name == 'OGLWidget':
+        from . oglwidget import OGLWidget
+        return OGLWidget
+    if name == 'OffscreenOGLWidget':
+        from . offscreenwidget import OffscreenOGLWidget
+        return OffscreenOGLWidget
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,50 @@
+from PyQt5.QtCore import QObject
+from PyQt5.QtGui import QGuiApplication
+from pylsl import local_clock
+import math
+
+class FrameLoop(QObject):
+    # while running, the next paint is requested when the previous frame is swapped,
+    # so with a swap interval of n there is exactly one paint every n display refreshes.
+    # every painted frame carries its predicted presentation time on the local_clock() timebase
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.widget = widget
+        self.running = False
+        self.frame_index = 0
+        self.frame_time = local_clock()
+        self.last_swap_time = None
+        self.refresh_period = 1. / 60
+        self.widget.frameSwapped.connect(self.frameSwapped)
+
+    def updateRefreshPeriod(self):
+        window = self.widget.window().windowHandle()
+        screen = window.screen() if window else QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen and screen.refreshRate() > 0 else 60.
+        self.refresh_period = max(1, self.widget.format().swapInterval()) / refresh_rate
+
+    def start(self):
+        if not self.running:
+            self.updateRefreshPeriod()
+            self.running = True
+        self.widget.update()
+
+    def stop(self):
+        self.running = False
+
+    def beginFrame(self):
+        # called at the start of paintGL, the frame is presented on the first refresh after the last swap
+        now = local_clock()
+        if self.frame_index == 0:
+            self.updateRefreshPeriod()
+        if self.last_swap_time is None:
+            self.frame_time = now
+        else:
+            refreshes = max(1, math.ceil((now - self.last_swap_time) / self.refresh_period))
+            self.frame_time = self.last_swap_time + refreshes * self.refresh_period
+        self.frame_index += 1
+
+    def frameSwapped(self):
+        self.last_swap_time = local_clock()
+        if self.running:
+            self.widget.update()
@@ -0,0 +1,124 @@
+import numpy as np
+import json, math
+
+class FrameStats:
+    # CPU render time, swap-to-swap interval and missed refreshes of every frame, kept in preallocated
+    # ring buffers. a full ring is folded into per-stage histograms, so sessions of any length are summarized.
+    # intervals and missed refreshes are only counted between consecutive frames of the running frame loop,
+    # a static stage is painted once and has no frame rate
+    BIN_WIDTH = 0.00025
+    BINS = 400  # 0 - 100 ms, the last bin also counts everything slower
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.swap_times = np.zeros(capacity)
+        self.render_times = np.zeros(capacity)
+        self.intervals = np.zeros(capacity)
+        self.missed = np.zeros(capacity, dtype=np.int32)
+        self.late = np.zeros(capacity, dtype=np.bool_)
+        self.stages = np.zeros(capacity, dtype=np.int32)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.last_swap_time = None
+        self.last_running = False
+        self.stage_ids = {}
+        self.stage_names = []
+        self.render_histograms = []
+        self.interval_histograms = []
+        self.totals = []  # per stage: frames, late frames, missed refreshes, render time sum, interval sum
+        self.maxima = []  # per stage: render time, interval
+        self.dropped_frames = []
+
+    def addStage(self, stage):
+        self.stage_ids[stage] = len(self.stage_names)
+        self.stage_names.append(stage)
+        self.render_histograms.append(np.zeros(self.BINS, dtype=np.int64))
+        self.interval_histograms.append(np.zeros(self.BINS, dtype=np.int64))
+        self.totals.append(np.zeros(5))
+        self.maxima.append(np.zeros(2))
+        return self.stage_ids[stage]
+
+    def record(self, stage, swap_time, render_time, running, refresh_period):
+        # called once per swapped frame, returns (interval, missed refreshes), the interval is nan between
+        # frames that are not both from the running frame loop
+        stage_id = self.stage_ids.get(stage)
+        if stage_id is None:
+            stage_id = self.addStage(stage)
+        interval = math.nan
+        missed = 0
+        if running and self.last_running and self.last_swap_time is not None:
+            interval = swap_time - self.last_swap_time
+            missed = max(0, round(interval / refresh_period) - 1)
+        self.last_swap_time = swap_time
+        self.last_running = running
+
+        i = self.count
+        self.swap_times[i] = swap_time
+        self.render_times[i] = render_time
+        self.intervals[i] = interval
+        self.missed[i] = missed
+        self.late[i] = render_time > refresh_period
+        self.stages[i] = stage_id
+        self.count += 1
+        if self.count == self.capacity:
+            self.fold()
+        return interval, missed
+
+    def histogram(self, values):
+        bins = np.minimum(values / self.BIN_WIDTH, self.BINS - 1).astype(np.int64)
+        return np.bincount(bins, minlength=self.BINS)
+
+    def fold(self):
+        n = self.count
+        stages = self.stages[:n]
+        for stage_id in np.unique(stages):
+            frames = stages == stage_id
+            render_times = self.render_times[:n][frames]
+            intervals = self.intervals[:n][frames]
+            intervals = intervals[~np.isnan(intervals)]
+            self.render_histograms[stage_id] += self.histogram(render_times)
+            self.interval_histograms[stage_id] += self.histogram(intervals)
+            self.totals[stage_id] += [len(render_times), np.count_nonzero(self.late[:n][frames]), self.missed[:n][frames].sum(),
+                                      render_times.sum(), intervals.sum()]
+            self.maxima[stage_id] = np.maximum(self.maxima[stage_id], [render_times.max(), intervals.max() if len(intervals) else 0.])
+        for i in np.flatnonzero(self.missed[:n]):
+            self.dropped_frames.append({'time': float(self.swap_times[i]), 'stage': self.stage_names[self.stages[i]],
+                                        'missed_refreshes': int(self.missed[i]), 'interval_ms': float(self.intervals[i] * 1000.)})
+        self.count = 0
+
+    def percentile(self, histogram, p):
+        # upper edge of the bin holding the p-th percentile, in ms
+        total = histogram.sum()
+        if total == 0:
+            return None
+        return float((np.searchsorted(np.cumsum(histogram), p / 100. * total) + 1) * self.BIN_WIDTH * 1000.)
+
+    def describe(self, render_histogram, interval_histogram, totals, maxima):
+        frames, late, missed, render_sum, interval_sum = totals
+        intervals = interval_histogram.sum()
+        return {
+            'frames': int(frames),
+            'late_frames': int(late),
+            'dropped_frames': int(missed),
+            'render_ms': {'mean': render_sum / frames * 1000. if frames else None, 'p95': self.percentile(render_histogram, 95),
+                          'p99': self.percentile(render_histogram, 99), 'max': maxima[0] * 1000.},
+            'interval_ms': {'mean': interval_sum / intervals * 1000. if intervals else None, 'p95': self.percentile(interval_histogram, 95),
+                            'p99': self.percentile(interval_histogram, 99), 'max': maxima[1] * 1000.},
+        }
+
+    def summary(self):
+        self.fold()
+        stages = {name: self.describe(self.render_histograms[i], self.interval_histograms[i], self.totals[i], self.maxima[i])
+                  for i, name in enumerate(self.stage_names)}
+        total = None
+        if self.stage_names:
+            total = self.describe(sum(self.render_histograms), sum(self.interval_histograms), sum(self.totals), np.max(self.maxima, axis=0))
+        return {'histogram_bin_ms': self.BIN_WIDTH * 1000., 'stages': stages, 'total': total, 'dropped_frames': self.dropped_frames}
+
+    def write(self, fname, **info):
+        summary = dict(info, **self.summary())
+        with open(fname, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
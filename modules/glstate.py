@@ -0,0 +1,76 @@
+from OpenGL.GL import *
+
+class GLState:
+    # remembers the GL state set during a frame, skips transitions to the state that is already set
+    # and counts the GL calls issued per frame
+    def __init__(self):
+        self.calls = 0
+        self.last_frame_calls = 0
+        self.forget()
+
+    def forget(self):
+        self.capabilities = {}
+        self.client_states = {}
+        self.depth_mask = None
+        self.blend_func = None
+        self.buffers = {}
+        self.texture = None
+
+    def beginFrame(self):
+        # Qt may use the context between frames, so the first transition of each frame is always issued
+        self.forget()
+        self.calls = 0
+
+    def endFrame(self):
+        self.last_frame_calls = self.calls
+
+    def count(self, calls=1):
+        self.calls += calls
+
+    def enable(self, capability):
+        if self.capabilities.get(capability) is not True:
+            glEnable(capability)
+            self.capabilities[capability] = True
+            self.calls += 1
+
+    def disable(self, capability):
+        if self.capabilities.get(capability) is not False:
+            glDisable(capability)
+            self.capabilities[capability] = False
+            self.calls += 1
+
+    def enableClientState(self, array):
+        if self.client_states.get(array) is not True:
+            glEnableClientState(array)
+            self.client_states[array] = True
+            self.calls += 1
+
+    def disableClientState(self, array):
+        if self.client_states.get(array) is not False:
+            glDisableClientState(array)
+            self.client_states[array] = False
+            self.calls += 1
+
+    def depthMask(self, flag):
+        if self.depth_mask != flag:
+            glDepthMask(flag)
+            self.depth_mask = flag
+            self.calls += 1
+
+    def blendFunc(self, src, dst):
+        if self.blend_func != (src, dst):
+            glBlendFunc(src, dst)
+            self.blend_func = (src, dst)
+            self.calls += 1
+
+    def bindBuffer(self, target, buffer):
+        if self.buffers.get(target) != buffer:
+            glBindBuffer(target, buffer)
+            self.buffers[target] = buffer
+            self.calls += 1
+
+    def bindTexture(self, texture):
+        if self.texture != texture:
+            glBindTexture(GL_TEXTURE_2D, texture)
+            self.texture = texture
+            self.calls += 1
@@ -0,0 +1,69 @@
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QImage, QImageReader, QGuiApplication
+from concurrent.futures import ThreadPoolExecutor
+import os
+from . texturecache import TextureCache
+from . protocol import TASK_PROMPTS
+
+# sprites used by every scene, the ones of each task and their sizes come from the task prompts
+COMMON_SPRITES = ['fixation', 'dotted_outline', 'dotted_outline_green', 'rocket', 'rocket_blast', 'ufo', 'ufo_blast']
+TASK_SPRITES = {task: [name for name, y, size in sprites] for task, (sprites, label) in TASK_PROMPTS.items() if sprites}
+
+# largest box each sprite is drawn in (viewport units), oversized sources are downscaled to fit it
+SPRITE_EXTENTS = {'fixation': 0.5, 'dotted_outline': 0.7, 'dotted_outline_green': 0.7,
+                  'rocket': 0.5, 'rocket_blast': 0.5, 'ufo': 0.5, 'ufo_blast': 0.5}
+SPRITE_EXTENTS.update({name: size for sprites, label in TASK_PROMPTS.values() for name, y, size in sprites})
+
+def requiredSprites(tasks):
+    sprites = list(COMMON_SPRITES)
+    for task in tasks:
+        sprites += TASK_SPRITES.get(task, [])
+    return sprites
+
+class ImageLoader:
+    # decodes sprite images on a thread pool, only the texture upload stays on the GL thread
+    def __init__(self, image_dir='images', cache_dir=os.path.join('cache', 'textures'), workers=None):
+        self.image_dir = image_dir
+        self.texture_cache = TextureCache(cache_dir)
+        self.downscale = os.environ.get('BCI_ROCKET_DOWNSCALE_TEXTURES', '1') == '1'
+        # screens are queried here on the GUI thread, never from the workers
+        self.screen_sizes = [(screen.geometry().width() * screen.devicePixelRatio(), screen.geometry().height() * screen.devicePixelRatio())
+                             for screen in QGuiApplication.screens()]
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
+
+    def prefetch(self, names):
+        for name in names:
+            if name not in self.futures:
+                self.futures[name] = self.executor.submit(self.load, name)
+
+    def loadAll(self, names):
+        # returns {name: QImage}, waiting for the ones that are still being decoded
+        names = list(dict.fromkeys(names))
+        self.prefetch(names)
+        return {name: self.futures.pop(name).result() for name in names}
+
+    def load(self, name):
+        # decoded images come from the on-disk texture cache, the PNG is only decoded on a miss
+        fname = os.path.join(self.image_dir, name + '.png')
+        if not os.path.isfile(fname):
+            raise KeyError(name)
+        size = QImageReader(fname).size()
+        if self.downscale and name in SPRITE_EXTENTS:
+            size = self.downscaledSize(size, SPRITE_EXTENTS[name])
+        return self.texture_cache.load(fname, size.width(), size.height(), lambda: self.decode(fname, size))
+
+    def decode(self, fname, size):
+        image = QImage(fname).mirrored()
+        if image.size() != size:
+            image = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        return image
+
+    def downscaledSize(self, size, extent):
+        # largest scale the image is drawn at on any screen, when the widget fills the whole screen
+        scale = 0.
+        for width, height in self.screen_sizes:
+            scale = max(scale, min(extent / 2. * width / size.width(), extent / 2. * height / size.height()))
+        if scale == 0. or scale >= 1.:
+            return size
+        return QSize(max(1, round(size.width() * scale)), max(1, round(size.height() * scale)))
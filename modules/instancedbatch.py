@@ -0,0 +1,100 @@
+from PyQt5.QtGui import QOpenGLShader, QOpenGLShaderProgram
+from OpenGL.GL import *
+import ctypes
+import numpy as np
+from . spritebatch import SpriteBatch
+
+VERTEX_SHADER = '''
+#version 330
+layout(location = 0) in vec2 corner;
+layout(location = 1) in vec2 center;
+layout(location = 2) in vec2 size;
+layout(location = 3) in vec4 uv_rect;
+layout(location = 4) in vec4 tint;
+out vec2 uv;
+out vec4 color;
+void main() {
+    uv = mix(uv_rect.xy, uv_rect.zw, corner);
+    color = tint;
+    gl_Position = vec4(center + (corner - 0.5) * size, 0.0, 1.0);
+}
+'''
+
+FRAGMENT_SHADER = '''
+#version 330
+uniform sampler2D sprite_texture;
+in vec2 uv;
+in vec4 color;
+out vec4 frag_color;
+void main() {
+    frag_color = texture(sprite_texture, uv) * color;
+}
+'''
+
+class InstancedSpriteBatch(SpriteBatch):
+    # same interface as SpriteBatch, but draws a unit quad once per sprite instance with a GLSL program.
+    # instance columns: center x, center y, width, height, u0, v0, u1, v1, r, g, b, a
+    INSTANCE_ATTRIBUTES = [(1, 0, 2), (2, 2, 2), (3, 4, 4), (4, 8, 4)]  # (location, first column, size)
+    INSTANCE_STRIDE = 12 * 4
+
+    def initializeGL(self):
+        self.vbo = glGenBuffers(1)
+        self.corner_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.corner_vbo)
+        corners = np.array([0,0, 1,0, 0,1, 1,1], dtype=np.float32)
+        glBufferData(GL_ARRAY_BUFFER, corners.nbytes, corners, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.program = QOpenGLShaderProgram()
+        if not self.program.addShaderFromSourceCode(QOpenGLShader.Vertex, VERTEX_SHADER) \
+                or not self.program.addShaderFromSourceCode(QOpenGLShader.Fragment, FRAGMENT_SHADER) \
+                or not self.program.link():
+            raise RuntimeError('Sprite shader failed to build: %s' % self.program.log())
+        self.program.bind()
+        self.program.setUniformValue('sprite_texture', 0)
+        self.program.release()
+
+    def pointInstances(self, first):
+        for location, column, size in self.INSTANCE_ATTRIBUTES:
+            offset = first * self.INSTANCE_STRIDE + column * 4
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, self.INSTANCE_STRIDE, ctypes.c_void_p(offset))
+        self.state.count(len(self.INSTANCE_ATTRIBUTES))
+
+    def flush(self):
+        if self.count == 0:
+            return
+        sprites = self.sprites[:self.count]
+        instances = np.empty((self.count, 12), dtype=np.float32)
+        instances[:, 0:2] = (sprites[:, 0:2] + sprites[:, 2:4]) / 2
+        instances[:, 2:4] = sprites[:, 2:4] - sprites[:, 0:2]
+        instances[:, 4:] = sprites[:, 4:]
+
+        state = self.state
+        self.program.bind()
+        state.bindBuffer(GL_ARRAY_BUFFER, self.corner_vbo)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 0, None)
+        state.bindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+        for location, column, size in self.INSTANCE_ATTRIBUTES:
+            glEnableVertexAttribArray(location)
+            glVertexAttribDivisor(location, 1)
+        state.count(4 + 2 * len(self.INSTANCE_ATTRIBUTES))
+
+        state.disable(GL_DEPTH_TEST)
+        state.depthMask(GL_FALSE)
+        state.enable(GL_BLEND)
+        state.blendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+        # glDrawArraysInstanced has no base instance, so each texture run re-points the instance attributes
+        for texture, start, end in self.textureRuns():
+            state.bindTexture(int(texture))
+            self.pointInstances(int(start))
+            glDrawArraysInstanced(GL_TRIANGLE_STRIP, 0, 4, int(end - start))
+            state.count()
+
+        for location in range(len(self.INSTANCE_ATTRIBUTES) + 1):
+            glDisableVertexAttribArray(location)
+        self.program.release()
+        state.count(len(self.INSTANCE_ATTRIBUTES) + 2)
+        self.count = 0
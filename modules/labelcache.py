@@ -0,0 +1,80 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPainter, QOpenGLTexture, QFont, QFontMetrics
+from collections import OrderedDict
+
+class Label:
+    # rasterized text, exposes the same width/height/textureId/uv as an atlas sprite
+    def __init__(self, texture, width, height):
+        self.texture = texture
+        self.w = width
+        self.h = height
+        self.uv = (0., 0., 1., 1.)
+        self.nbytes = width * height * 4
+
+    def width(self):
+        return self.w
+
+    def height(self):
+        return self.h
+
+    def textureId(self):
+        return self.texture.textureId()
+
+class LabelCache:
+    # label textures keyed by (text, font, pixel size, color), least recently used evicted over budget
+    def __init__(self, budget=16 * 1024 * 1024, padding=2):
+        self.budget = budget
+        self.padding = padding
+        self.labels = OrderedDict()
+        self.nbytes = 0
+        self.evicted = []
+
+    def get(self, text, font, pixel_size, color):
+        key = (text, font.key(), pixel_size, color.rgba())
+        label = self.labels.get(key)
+        if label is not None:
+            self.labels.move_to_end(key)
+            return label
+
+        label = self.rasterize(text, font, pixel_size, color)
+        self.labels[key] = label
+        self.nbytes += label.nbytes
+        while self.nbytes > self.budget and len(self.labels) > 1:
+            # evicted labels may still be queued in this frame's batch, destroy them in collect()
+            _, evicted = self.labels.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evicted.append(evicted)
+        return label
+
+    def rasterize(self, text, font, pixel_size, color):
+        font = QFont(font)
+        font.setPixelSize(pixel_size)
+        metrics = QFontMetrics(font)
+        width = max(1, metrics.horizontalAdvance(text)) + 2 * self.padding
+        height = max(1, metrics.height()) + 2 * self.padding
+
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.setPen(color)
+        painter.setFont(font)
+        painter.drawText(image.rect(), Qt.AlignHCenter | Qt.AlignVCenter, text)
+        painter.end()
+
+        texture = QOpenGLTexture(image.mirrored())
+        texture.setMinificationFilter(QOpenGLTexture.Linear)
+        texture.setMagnificationFilter(QOpenGLTexture.Linear)
+        texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+        return Label(texture, width, height)
+
+    def collect(self):
+        for label in self.evicted:
+            label.texture.destroy()
+        self.evicted = []
+
+    def clear(self):
+        self.evicted.extend(self.labels.values())
+        self.labels.clear()
+        self.nbytes = 0
+        self.collect()
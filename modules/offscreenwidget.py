@@ -0,0 +1,89 @@
+from PyQt5.QtCore import Qt, QSize, QTimer
+from PyQt5.QtGui import QOffscreenSurface, QOpenGLContext, QOpenGLFramebufferObject, QOpenGLFramebufferObjectFormat
+from OpenGL.GL import *
+from pylsl import local_clock
+import os
+from . oglwidget import OGLWidget
+
+class OffscreenOGLWidget(OGLWidget):
+    # runs the scenes without a display. the widget is never shown, frames are rendered into an FBO
+    # on an offscreen surface and frameSwapped is emitted after each one, so the frame loop and the
+    # repaint scheduler drive it like the on-screen widget. with dump_dir every frame is saved as a PNG
+    def __init__(self, parent, image_loader=None, size=(1280, 720), dump_dir=None):
+        super().__init__(parent, image_loader)
+        self.hide()
+        self.frame_size = QSize(*size)
+        self.dump_dir = dump_dir
+        if dump_dir:
+            os.makedirs(dump_dir, exist_ok=True)
+
+        # stands in for the display refresh, at most one frame per refresh period
+        self.frame_timer = QTimer()
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.renderFrame)
+
+        self.surface = QOffscreenSurface()
+        self.surface.setFormat(self.format())
+        self.surface.create()
+        self.context = QOpenGLContext()
+        self.context.setFormat(self.format())
+        if not self.context.create():
+            # the offscreen QPA plugin of Qt 5 only has OpenGL through GLX, i.e. with an X display
+            raise RuntimeError('Could not create an offscreen OpenGL context, without a display run under an X server, e.g. xvfb-run -a')
+        self.context.makeCurrent(self.surface)
+        fbo_format = QOpenGLFramebufferObjectFormat()
+        fbo_format.setAttachment(QOpenGLFramebufferObject.CombinedDepthStencil)
+        self.fbo = QOpenGLFramebufferObject(self.frame_size, fbo_format)
+        self.fbo.bind()
+        self.initializeGL()
+        self.resizeGL(self.width(), self.height())
+        self.context.doneCurrent()
+
+    # the scene code only sees the frame size and the offscreen context
+
+    def width(self):
+        return self.frame_size.width()
+
+    def height(self):
+        return self.frame_size.height()
+
+    def devicePixelRatioF(self):
+        return 1.
+
+    def isValid(self):
+        return getattr(self, 'fbo', None) is not None
+
+    def makeCurrent(self):
+        self.context.makeCurrent(self.surface)
+        self.fbo.bind()
+
+    def doneCurrent(self):
+        self.context.doneCurrent()
+
+    def defaultFramebufferObject(self):
+        return self.fbo.handle()
+
+    def update(self):
+        if self.frame_timer.isActive():
+            return
+        last_swap_time = self.frame_loop.last_swap_time
+        delay = 0. if last_swap_time is None else max(0., last_swap_time + self.frame_loop.refresh_period - local_clock())
+        self.frame_timer.start(round(delay * 1000))
+
+    def renderFrame(self):
+        self.makeCurrent()
+        # same as QOpenGLWidget before paintGL
+        glViewport(0, 0, self.width(), self.height())
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT | GL_STENCIL_BUFFER_BIT)
+        self.paintGL()
+        # stands in for the swap, the frame is complete once frameSwapped is emitted
+        glFinish()
+        if self.dump_dir:
+            self.dumpFrame()
+        self.doneCurrent()
+        self.frameSwapped.emit()
+
+    def dumpFrame(self):
+        fname = os.path.join(self.dump_dir, 'frame_%06d.png' % self.frame_loop.frame_index)
+        self.fbo.toImage().save(fname)
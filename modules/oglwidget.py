@@ -1,27 +1,61 @@
 from PyQt5.QtWidgets import QOpenGLWidget
 from PyQt5.QtCore import *
-from PyQt5.QtGui import QPainter, QOpenGLTexture, QImage, QColor, QFont
+from PyQt5.QtGui import QOpenGLFramebufferObject, QColor, QFont, QSurfaceFormat
 from OpenGL.GL import *
 from OpenGL.GLU import *
-import os, copy, math, random
+import os, copy, math, random, time
 from pylsl import StreamInfo, StreamOutlet, StreamInlet, ContinuousResolver, resolve_bypred, local_clock
-import numpy as np
+from . glstate import GLState
+from . spritebatch import SpriteBatch
+from . instancedbatch import InstancedSpriteBatch
+from . texturemanager import TextureManager
+from . imageloader import ImageLoader, COMMON_SPRITES, requiredSprites
+from . labelcache import LabelCache
+from . repaintscheduler import RepaintScheduler
+from . rocketanimation import RocketAnimation
+from . framestats import FrameStats
+from . stagescheduler import StageScheduler, ThreadedStageScheduler
+from . onsetaudit import OnsetAudit
+from . protocol import *
 
 class OGLWidget(QOpenGLWidget):
-    def __init__(self, parent):
+    task_selected = pyqtSignal(int)
+    session_stopped = pyqtSignal()
+
+    def __init__(self, parent, image_loader=None):
         super().__init__(parent)
         self.setAttribute(Qt.WA_AlwaysStackOnTop)
         self.colors = [QColor(255,0,0), QColor(0,255,0), QColor(0,0,255)]
         self.text_color = QColor(255,255,255);
         self.font = QFont("Arial", 50, QFont.Bold, False)
 
-        self.timer = QTimer()
-        self.timer.setTimerType(Qt.PreciseTimer)
-
-        self.update_timer = QTimer()
-        self.update_timer.setTimerType(Qt.PreciseTimer)
-        self.update_timer.setInterval(16)
-        self.update_timer.timeout.connect(self.update)
+        # stage transitions fire at absolute deadlines, late ones are reported. the timing thread
+        # sleeps and spins for sub-millisecond deadlines, the QTimer scheduler uses less power
+        if os.environ.get('BCI_ROCKET_TIMING_THREAD', '0') == '1':
+            self.scheduler = ThreadedStageScheduler(self)
+        else:
+            self.scheduler = StageScheduler(self)
+        self.scheduler.late.connect(self.lateTransition)
+        # pause and prediction waits hold the scheduler until setPauseRequested or task_selected ends them
+        self.pause_requested = False
+        self.paused = False
+        self.waiting_for_prediction = False
+        self.task_selected.connect(self.taskSelected)
+
+        self.repaint_scheduler = RepaintScheduler(self)
+        self.frame_loop = self.repaint_scheduler.frame_loop
+
+        # per-frame timing of the session, written to log_dir at stop() and optionally streamed over LSL
+        self.log_dir = os.environ.get('BCI_ROCKET_LOG_DIR', 'logs')
+        self.frame_stats = FrameStats()
+        self.onset_audit = OnsetAudit()
+        self.render_time = 0.
+        self.frame_stats_outlet = None
+        if os.environ.get('BCI_ROCKET_FRAME_STATS_LSL', '0') == '1':
+            # channels: render time, inter-frame interval (s) and missed refreshes, stamped with the swap time
+            self.frame_stats_outlet = StreamOutlet(StreamInfo('BCI Rocket Frame Stats', 'FrameStats', 3, 0, 'float32', 'bci_rocket_frame_stats'))
+            self.frame_stats_sample = [0., 0., 0.]
+        self.frameSwapped.connect(self.recordFrame)
 
         self.lsl_pull_timer = QTimer()
         self.lsl_pull_timer.setTimerType(Qt.PreciseTimer)
@@ -33,319 +67,275 @@ class OGLWidget(QOpenGLWidget):
         self.cue_duration = 2.5
         self.task_duration = 5
         self.break_duration = 5
-        self.cue_text = 'cue text'
 
-        self.scene = ''
+        # the running session, compiled into a protocol at its start. the stage_* fields mirror the
+        # protocol row of the current stage for the scenes
+        self.scene = NO_SCENE
+        self.protocol = None
+        self.stage_index = 0
         self.stage = ''
-        self.num_start_simple = 0
-        self.num_subtract_simple = 0
-        self.num_start_complex = 0
-        self.num_subtract_complex = 0
-        self.word = ''
+        self.stage_kind = -1
+        self.stage_column = -1
+        self.stage_labels = None
+        self.cue_text = ''
+        self.column_sprites = []
+        self.column_labels = []
         self.word_categories = ['Animals', 'Places', 'Shapes', 'Sports', 'Foods', 'Colours', 'Cities']
         self.current_task = -1
+        self.current_trial = 0
+        self.current_score = 0
+        self.stream_inlet = None
 
-        self.rocket_positions = np.array([[-0.5,0], [0,0], [0.5, 0]])
-        
+        # sprites are decoded by the image loader, only the ones of the configured tasks are uploaded
+        self.image_loader = image_loader if image_loader else ImageLoader()
+        self.images = TextureManager(self.image_loader.loadAll, int(os.environ.get('BCI_ROCKET_TEXTURE_BUDGET_MB', 64)) * 1024 * 1024)
+
+        self.rockets = RocketAnimation()
+        self.rocket_positions = self.rockets.positions
+        # sprite renderer, 'fixed' for the fixed-function pipeline or 'instanced' for the GLSL 3.3 instanced path
+        self.renderer = os.environ.get('BCI_ROCKET_RENDERER', 'fixed')
+        self.gl_state = GLState()
+        if self.renderer == 'instanced':
+            surface_format = self.format()
+            surface_format.setVersion(3, 3)
+            surface_format.setProfile(QSurfaceFormat.CompatibilityProfile)
+            self.setFormat(surface_format)
+            self.batch = InstancedSpriteBatch(self.gl_state)
+        else:
+            self.batch = SpriteBatch(self.gl_state)
+        self.labels = LabelCache()
+        self.warm_up_fbo = None
         
         # setup outlet stream at start - TODO update to allow changing name?
         self.ui = parent.ui
         self.stream_info = StreamInfo(self.ui.lsl_marker_outlet_lineEdit.text(), 'Markers', 1, 0, 'string', 'bci_hoops')
         self.stream_outlet = StreamOutlet(self.stream_info)
         print("LSL Marker Outlet Stream Initialized")
+        # stage markers wait for the first frame showing the new stage and are stamped with its swap time,
+        # as (marker, transition time). if no frame is swapped within a few refreshes (minimized or
+        # occluded window) they are sent stamped with their transition time instead
+        self.pending_markers = []
+        self.painted_markers = []
+        self.marker_timer = QTimer()
+        self.marker_timer.setTimerType(Qt.PreciseTimer)
+        self.marker_timer.setSingleShot(True)
+        self.marker_timer.timeout.connect(self.flushMarkers)
+        self.marker_timeout_refreshes = 4
+        # set at the rest onset, the upcoming task is warmed up after the rest frame is swapped
+        self.warm_up_pending = False
 
     def initializeGL(self):
         glClearColor(0,0,0,0)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.batch.initializeGL()
+
+        # upload the common sprites and the ones of the configured tasks
+        self.images.max_size = min(glGetIntegerv(GL_MAX_TEXTURE_SIZE), 4096)
+        self.images.prefetch(self.requiredSprites())
 
-        # Find all images
-        self.image_dir = 'images'
-        self.image_files = []
-        for f in os.listdir(self.image_dir):
-            fname = os.path.join(self.image_dir, f)
-            if os.path.isfile(fname) and fname.endswith('.png'):
-                self.image_files.append(f)
-
-        # Load all images
-        self.images = {}
-        for f in self.image_files:
-            im = QOpenGLTexture(QImage(os.path.join(self.image_dir, f)).mirrored())
-            im.setMinificationFilter(QOpenGLTexture.Linear)
-            im.setMagnificationFilter(QOpenGLTexture.Linear)
-            im.setWrapMode(QOpenGLTexture.ClampToBorder)
-            im.setBorderColor(QColor(0,0,0,0))
-            self.images[f.replace('.png', '')] = im
+    def requiredSprites(self, tasks=None):
+        if tasks is None:
+            tasks = [self.ui.task1_comboBox.currentText(), self.ui.task2_comboBox.currentText(), self.ui.task3_comboBox.currentText()]
+        return requiredSprites(tasks)
+
+    def prefetchTextures(self, tasks=None):
+        # before initializeGL the sprites are uploaded there instead
+        if not self.isValid():
+            return
+        self.makeCurrent()
+        self.images.prefetch(self.requiredSprites(tasks))
+        self.warmUp(tasks)
+        self.doneCurrent()
+
+    def requiredLabels(self, tasks=None):
+        # (size, text, scale) of every label the scenes draw for these tasks, the per-trial labels of a
+        # running session are the ones of its current stage
+        if tasks is None:
+            tasks = [self.ui.task1_comboBox.currentText(), self.ui.task2_comboBox.currentText(), self.ui.task3_comboBox.currentText()]
+        labels = [([2, 0.5], 'Starting in %d...' % i, None) for i in range(1, self.baseline_cue_duration + 1)]
+        labels.append(([2, 0.5], 'Rest', None))
+        running = self.protocol is not None and self.stage_labels is not None and tasks == self.protocol.tasks
+        for column, task in enumerate(tasks):
+            label = TASK_PROMPTS[task][1]
+            text = self.stage_labels[column] if running else label and label[2]
+            if text:
+                labels.append((label[1], text, 0.15))
+        return labels
+
+    def warmUp(self, tasks=None):
+        # draws every sprite and label of the session into an offscreen target and waits for it, so the
+        # driver finishes the lazy parts of the uploads here and not on the first frame that shows them.
+        # needs the context current, the widget framebuffer and viewport are restored afterwards
+        if self.warm_up_fbo is None:
+            self.warm_up_fbo = QOpenGLFramebufferObject(64, 64)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        self.warm_up_fbo.bind()
+        glViewport(0, 0, 64, 64)
+        self.gl_state.beginFrame()
+        for name in self.requiredSprites(tasks):
+            self.drawImage([-1, -1, 1, 1], self.images[name])
+        for size, text, scale in self.requiredLabels(tasks):
+            self.drawTextCentered([0, 0], size, text, self.text_color, scale=scale)
+        self.batch.flush()
+        self.gl_state.endFrame()
+        glFinish()
+        glBindFramebuffer(GL_FRAMEBUFFER, self.defaultFramebufferObject())
+        glViewport(*viewport)
+        self.labels.collect()
 
     def resizeGL(self, width, height):
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
         glViewport(0,0,width,height)
+        # label pixel sizes depend on the widget size, rasterize them again before they are needed
+        self.labels.clear()
+        self.warmUp()
 
     def paintGL(self):
-        if self.scene == 'baseline':
+        paint_start = local_clock()
+        self.frame_loop.beginFrame()
+        if self.pending_markers:
+            self.painted_markers += self.pending_markers
+            self.pending_markers.clear()
+        self.gl_state.beginFrame()
+        if self.scene == BASELINE_SCENE:
             self.baselineScene()
-        elif self.scene == 'training':
+        elif self.scene == TRAINING_SCENE:
             self.trainingScene()
-        elif self.scene == 'game':
+        elif self.scene == GAME_SCENE:
             self.gameScene()
+        self.batch.flush()
+        self.gl_state.endFrame()
+        self.labels.collect()
+        self.render_time = local_clock() - paint_start
+
+    def recordFrame(self):
+        swap_time = local_clock()
+        if self.painted_markers:
+            for marker, transition_time in self.painted_markers:
+                self.stream_outlet.push_sample([marker], swap_time)
+            self.onset_audit.presented(len(self.painted_markers), swap_time)
+            self.painted_markers.clear()
+            if not self.pending_markers:
+                self.marker_timer.stop()
+        if self.warm_up_pending and not self.pending_markers:
+            # the frame just swapped shows the rest stage, the warm-up no longer delays its onset
+            self.warm_up_pending = False
+            self.warmUpStage()
+        interval, missed = self.frame_stats.record(self.stage, swap_time, self.render_time, self.frame_loop.running, self.frame_loop.refresh_period)
+        if self.frame_stats_outlet:
+            self.frame_stats_sample[0] = self.render_time
+            self.frame_stats_sample[1] = interval
+            self.frame_stats_sample[2] = missed
+            self.frame_stats_outlet.push_sample(self.frame_stats_sample, swap_time)
+
+    def lateTransition(self, deadline, lateness):
+        print('WARNING: transition from stage %s is %.1f ms late' % (self.stage, lateness * 1000))
+
+    def pushStageMarker(self, marker):
+        # pushed by recordFrame once the frame that shows the new stage is swapped
+        if self.scheduler.firing:
+            transition_time = self.scheduler.fire_time
+            self.onset_audit.transition(marker, self.scheduler.deadline, transition_time)
+        else:
+            # first stage of a session, planned for now
+            transition_time = local_clock()
+            self.onset_audit.transition(marker, transition_time, transition_time)
+        self.pending_markers.append((marker, transition_time))
+        if not self.marker_timer.isActive():
+            self.marker_timer.start(math.ceil(self.marker_timeout_refreshes * self.frame_loop.refresh_period * 1000))
+
+    def flushMarkers(self):
+        # markers of frames that were not swapped in time or will not be shown any more, stamped with
+        # their transition time. they count as not presented in the onset audit
+        markers = self.painted_markers + self.pending_markers
+        for marker, transition_time in markers:
+            self.stream_outlet.push_sample([marker], transition_time)
+        if markers:
+            self.onset_audit.presented(len(markers), math.nan)
+        self.painted_markers.clear()
+        self.pending_markers.clear()
+        self.marker_timer.stop()
+
+    def writeSessionLogs(self):
+        # frame stats and onset audit of the session that just stopped
+        if not self.scene:
+            return
+        os.makedirs(self.log_dir, exist_ok=True)
+        session = '%s_%s' % (SCENE_NAMES[self.scene], time.strftime('%Y%m%d_%H%M%S'))
+        info = {'scene': SCENE_NAMES[self.scene], 'tasks': self.protocol.tasks if self.protocol else None, 'refresh_period': self.frame_loop.refresh_period}
+        if self.frame_stats.stage_names:
+            fname = os.path.join(self.log_dir, 'frame_stats_%s.json' % session)
+            summary = self.frame_stats.write(fname, **info)
+            print('Frame stats written to %s: %d frames, %d dropped' % (fname, summary['total']['frames'], summary['total']['dropped_frames']))
+        if self.onset_audit.count:
+            fname = os.path.join(self.log_dir, 'onset_audit_%s.json' % session)
+            summary = self.onset_audit.write(fname, **info)
+            if summary['presentation_lateness']:
+                print('Onset audit written to %s: %d transitions, presented %.1f ms late on average, at most %.1f ms' % (fname, summary['transitions'],
+                      summary['presentation_lateness']['mean_ms'], summary['presentation_lateness']['max_ms']))
+        self.frame_stats.reset()
+        self.onset_audit.reset()
 
     def baselineScene(self):
-        if self.stage == 'cue':
+        if self.stage_kind == BASELINE_CUE:
             self.drawTextCentered([0,0], [2, 0.5], self.cue_text, self.text_color)
-        elif self.stage == 'fixation':
+        elif self.stage_kind == FIXATION:
             self.drawImageCentered([0,0], [0.5, 0.5], self.images['fixation'])
 
     def trainingScene(self):
-        if self.stage == 'cue_rest':
+        if self.stage_kind == CUE_REST:
             self.drawTextCentered([0,0], [2, 0.5], 'Rest', self.text_color)
-        elif self.stage == 'rest':
+        elif self.stage_kind == REST:
             self.drawImageCentered([0,0], [0.5, 0.5], self.images['fixation'])
-        # elif self.stage == 'cue_Auditory Imagery':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['music'])
-        # elif self.stage == 'cue_Facial Imagery - Celebrity':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['face_celebrity'])
-        #     self.drawTextCentered([0,0.35], [2, 0.5], 'Celebrity', self.text_color)
-        # elif self.stage == 'cue_Facial Imagery - Family Member':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['face_family'])
-        #     self.drawTextCentered([0,0.35], [2, 0.5], 'Family member', self.text_color)
-        # elif self.stage == 'cue_Motor Imagery - Foot':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['foot'])
-        # elif self.stage == 'cue_Motor Imagery - Left Hand':
-        #     self.drawImageCentered([0,0], [0.8, 0.8], self.images['left_hand'])
-        # elif self.stage == 'cue_Motor Imagery - Right Hand':
-        #     self.drawImageCentered([0,0], [0.8, 0.8], self.images['right_hand'])
-        # elif self.stage == 'cue_Motor Imagery - Tongue':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['tongue'])
-        # elif self.stage == 'cue_Shape Rotation - Cube':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['cube'])
-        # elif self.stage == 'cue_Shape Rotation - Complex Shape':
-        #     self.drawImageCentered([0,-0.1], [0.8, 0.8], self.images['complex_shape'])
-        # elif self.stage == 'cue_Subtraction - Simple':
-        #     self.drawTextCentered([0,0], [2, 0.5], 'Mental Math: %d - %d - %d = ?' % (self.num_start_simple, self.num_subtract_simple, self.num_subtract_simple), self.text_color)
-        # elif self.stage == 'cue_Subtraction - Complex':
-        #     self.drawTextCentered([0,0], [2, 0.5], 'Mental Math: %d - %d - %d = ?' % (self.num_start_complex, self.num_subtract_complex, self.num_subtract_complex), self.text_color)
-        # elif self.stage == 'cue_Word Generation':
-        #     self.drawTextCentered([0,0], [2, 0.5], 'Words: %s' % self.word, self.text_color)
-        elif self.stage == 'break':
-            for i in range(3):
-                # draw prompts
-                if self.stage == self.tasks[i]:
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline_green'])
-                else:
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline'])
-                if self.tasks[i] == 'Auditory Imagery':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['music'])
-                elif self.tasks[i] == 'Facial Imagery - Celebrity':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_celebrity'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Celebrity', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Facial Imagery - Family Member':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_family'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Family member', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Motor Imagery - Foot':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['foot'])
-                elif self.tasks[i] == 'Motor Imagery - Left Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['left_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Right Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['right_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Tongue':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['tongue'])
-                elif self.tasks[i] == 'Shape Rotation - Cube':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.33, 0.33], self.images['cube'])
-                elif self.tasks[i] == 'Shape Rotation - Complex Shape':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['complex_shape'])
-                elif self.tasks[i] == 'Subtraction - Simple':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_simple, self.num_subtract_simple, self.num_subtract_simple), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Subtraction - Complex':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_complex, self.num_subtract_complex, self.num_subtract_complex), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Word Generation':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [3, 0.3], 'Words: %s' % self.word, self.text_color, scale=0.15)
-
-                # draw rocket
-                if i == self.trials[self.current_trial]:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket_blast'])
-                else:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo_blast'])
-
-                # update rocket position
-                if i == self.trials[self.current_trial]:
-                    self.rocket_positions[i][1] += 0.02
         else:
-            for i in range(3):
-                # draw prompts
-                if self.stage == self.tasks[i] or (self.stage.startswith('cue_') and self.stage.replace('cue_','') == self.tasks[i] and local_clock() % 0.6 < 0.3):
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline_green'])
-                else:
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline'])
-                if self.tasks[i] == 'Auditory Imagery':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['music'])
-                elif self.tasks[i] == 'Facial Imagery - Celebrity':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_celebrity'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Celebrity', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Facial Imagery - Family Member':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_family'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Family member', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Motor Imagery - Foot':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['foot'])
-                elif self.tasks[i] == 'Motor Imagery - Left Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['left_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Right Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['right_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Tongue':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['tongue'])
-                elif self.tasks[i] == 'Shape Rotation - Cube':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.33, 0.33], self.images['cube'])
-                elif self.tasks[i] == 'Shape Rotation - Complex Shape':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['complex_shape'])
-                elif self.tasks[i] == 'Subtraction - Simple':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_simple, self.num_subtract_simple, self.num_subtract_simple), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Subtraction - Complex':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_complex, self.num_subtract_complex, self.num_subtract_complex), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Word Generation':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [3, 0.3], 'Words: %s' % self.word, self.text_color, scale=0.15)
-
-                # draw rocket
-                if i == self.trials[self.current_trial]:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket_blast'])
-                else:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo_blast'])
+            if self.stage_kind == BREAK:
+                # the active rocket launches on the first break frame, heights follow from the frame time
+                self.rockets.launch(self.stage_column, self.frame_loop.frame_time)
+                self.rockets.update(self.frame_loop.frame_time)
+            self.drawTaskColumns()
 
     def gameScene(self):
-        if self.stage == 'cue_rest':
+        if self.stage_kind == CUE_REST:
             self.drawTextCentered([0,0], [2, 0.5], 'Rest', self.text_color)
-        elif self.stage == 'rest':
+        elif self.stage_kind == REST:
             self.drawImageCentered([0,0], [0.5, 0.5], self.images['fixation'])
-        # elif self.stage == 'cue_Auditory Imagery':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['music'])
-        # elif self.stage == 'cue_Facial Imagery - Celebrity':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['face_celebrity'])
-        #     self.drawTextCentered([0,0.35], [2, 0.5], 'Celebrity', self.text_color)
-        # elif self.stage == 'cue_Facial Imagery - Family Member':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['face_family'])
-        #     self.drawTextCentered([0,0.35], [2, 0.5], 'Family member', self.text_color)
-        # elif self.stage == 'cue_Motor Imagery - Foot':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['foot'])
-        # elif self.stage == 'cue_Motor Imagery - Left Hand':
-        #     self.drawImageCentered([0,0], [0.8, 0.8], self.images['left_hand'])
-        # elif self.stage == 'cue_Motor Imagery - Right Hand':
-        #     self.drawImageCentered([0,0], [0.8, 0.8], self.images['right_hand'])
-        # elif self.stage == 'cue_Motor Imagery - Tongue':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['tongue'])
-        # elif self.stage == 'cue_Shape Rotation - Cube':
-        #     self.drawImageCentered([0,0], [0.5, 0.5], self.images['cube'])
-        # elif self.stage == 'cue_Shape Rotation - Complex Shape':
-        #     self.drawImageCentered([0,-0.1], [0.8, 0.8], self.images['complex_shape'])
-        # elif self.stage == 'cue_Subtraction - Simple':
-        #     self.drawTextCentered([0,0], [2, 0.5], 'Mental Math: %d - %d - %d = ?' % (self.num_start_simple, self.num_subtract_simple, self.num_subtract_simple), self.text_color)
-        # elif self.stage == 'cue_Subtraction - Complex':
-        #     self.drawTextCentered([0,0], [2, 0.5], 'Mental Math: %d - %d - %d = ?' % (self.num_start_complex, self.num_subtract_complex, self.num_subtract_complex), self.text_color)
-        # elif self.stage == 'cue_Word Generation':
-        #     self.drawTextCentered([0,0], [2, 0.5], 'Words: %s' % self.word, self.text_color)
-        elif self.stage == 'break':
-            for i in range(3):
-                # draw prompts
-                if self.stage == self.tasks[i]:
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline_green'])
-                else:
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline'])
-                if self.tasks[i] == 'Auditory Imagery':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['music'])
-                elif self.tasks[i] == 'Facial Imagery - Celebrity':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_celebrity'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Celebrity', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Facial Imagery - Family Member':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_family'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Family member', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Motor Imagery - Foot':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['foot'])
-                elif self.tasks[i] == 'Motor Imagery - Left Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['left_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Right Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['right_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Tongue':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['tongue'])
-                elif self.tasks[i] == 'Shape Rotation - Cube':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.33, 0.33], self.images['cube'])
-                elif self.tasks[i] == 'Shape Rotation - Complex Shape':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['complex_shape'])
-                elif self.tasks[i] == 'Subtraction - Simple':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_simple, self.num_subtract_simple, self.num_subtract_simple), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Subtraction - Complex':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_complex, self.num_subtract_complex, self.num_subtract_complex), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Word Generation':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [3, 0.3], 'Words: %s' % self.word, self.text_color, scale=0.15)
-
-                # draw rocket
-                if i == self.trials[self.current_trial]:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket_blast'])
-                else:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo_blast'])
-
-                # update rocket position
-                if i == self.current_task:
-                    self.rocket_positions[i][1] += 0.02
         else:
-            for i in range(3):
-                # draw prompts
-                if self.stage == self.tasks[i] or (self.stage.startswith('cue_') and self.stage.replace('cue_','') == self.tasks[i] and local_clock() % 0.6 < 0.3):
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline_green'])
+            if self.stage_kind == BREAK:
+                # the selected rocket launches on the first frame it is selected, heights follow from the frame time
+                if self.current_task != -1:
+                    self.rockets.launch(self.current_task, self.frame_loop.frame_time)
+                self.rockets.update(self.frame_loop.frame_time)
+            self.drawTaskColumns()
+
+    def drawTaskColumns(self):
+        # the outline of the current task is green during the task and blinks during its cue
+        highlighted = -1
+        if self.stage_kind == TASK or (self.stage_kind == CUE_TASK and self.frame_loop.frame_time % 0.6 < 0.3):
+            highlighted = self.stage_column
+        for i in range(3):
+            x = self.rocket_positions[i][0]
+            # draw prompts
+            if i == highlighted:
+                self.drawImageCentered([x,-0.6], [0.7, 0.7], self.images['dotted_outline_green'])
+            else:
+                self.drawImageCentered([x,-0.6], [0.7, 0.7], self.images['dotted_outline'])
+            for name, y, size in self.column_sprites[i]:
+                self.drawImageCentered([x,y], [size, size], self.images[name])
+            if self.column_labels[i]:
+                self.drawTextCentered([x,self.column_labels[i][0]], self.column_labels[i][1], self.stage_labels[i], self.text_color, scale=0.15)
+
+            # draw rocket
+            if i == self.stage_column:
+                if self.rocket_positions[i][1] == 0:
+                    self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket'])
                 else:
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.7, 0.7], self.images['dotted_outline'])
-                if self.tasks[i] == 'Auditory Imagery':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['music'])
-                elif self.tasks[i] == 'Facial Imagery - Celebrity':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_celebrity'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Celebrity', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Facial Imagery - Family Member':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.65], [0.3, 0.3], self.images['face_family'])
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.4], [0.3, 0.3], 'Family member', self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Motor Imagery - Foot':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['foot'])
-                elif self.tasks[i] == 'Motor Imagery - Left Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['left_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Right Hand':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['right_hand'])
-                elif self.tasks[i] == 'Motor Imagery - Tongue':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], self.images['tongue'])
-                elif self.tasks[i] == 'Shape Rotation - Cube':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.33, 0.33], self.images['cube'])
-                elif self.tasks[i] == 'Shape Rotation - Complex Shape':
-                    self.drawImageCentered([self.rocket_positions[i][0],-0.6], [0.4, 0.4], self.images['complex_shape'])
-                elif self.tasks[i] == 'Subtraction - Simple':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_simple, self.num_subtract_simple, self.num_subtract_simple), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Subtraction - Complex':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [0.3, 0.3], '%d - %d - %d = ?' % (self.num_start_complex, self.num_subtract_complex, self.num_subtract_complex), self.text_color, scale=0.15)
-                elif self.tasks[i] == 'Word Generation':
-                    self.drawTextCentered([self.rocket_positions[i][0],-0.6], [3, 0.3], 'Words: %s' % self.word, self.text_color, scale=0.15)
-
-                # draw rocket
-                if i == self.trials[self.current_trial]:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket_blast'])
+                    self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['rocket_blast'])
+            else:
+                if self.rocket_positions[i][1] == 0:
+                    self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo'])
                 else:
-                    if self.rocket_positions[i][1] == 0:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo'])
-                    else:
-                        self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo_blast'])
+                    self.drawImageCentered(self.rocket_positions[i], [0.5, 0.5], self.images['ufo_blast'])
 
     def drawImageCentered(self, center, size, image):
         # center = [center_x, center_y], size = [size_x, size_y]
@@ -367,28 +357,8 @@ class OGLWidget(QOpenGLWidget):
             top = positions[1]
             bottom = positions[3]
 
-        # Render image
-        # glColor3f(1., 1., 1.)
-        glDisable(GL_DEPTH_TEST)
-        glDepthMask(GL_FALSE)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-        glBindTexture(GL_TEXTURE_2D, image.textureId())
-        glEnable(GL_TEXTURE_2D)
-
-        glBegin(GL_QUADS)
-        glTexCoord2f(0,0); glVertex2f(left,top)
-        glTexCoord2f(0,1); glVertex2f(left,bottom)
-        glTexCoord2f(1,1); glVertex2f(right,bottom)
-        glTexCoord2f(1,0); glVertex2f(right,top)
-        glEnd()
-
-        glDisable(GL_TEXTURE_2D)
-
-        glEnable(GL_DEPTH_TEST)
-        glDisable(GL_BLEND)
-        glDepthMask(GL_TRUE)
+        # queue image, the batch is submitted at the end of the frame
+        self.batch.add(image.textureId(), (left, top, right, bottom), image.uv)
 
     def drawTextCentered(self, center, size, text, color, font=None, scale=None):
         positions = [center[0] - size[0]/2, center[1] + size[1]/2, center[0] + size[0]/2, center[1] - size[1]/2]
@@ -405,163 +375,109 @@ class OGLWidget(QOpenGLWidget):
         pos.append(int((1-(positions[1] + 1.) / 2.) * self.height()))
         pos.append(int(((positions[2]-positions[0])) / 2. * self.width()))
         pos.append(int((1-((positions[3]-positions[1]) / 2.) * self.height())))
-        rect = QRect(pos[0], pos[1], pos[2], pos[3])
 
-        # draw text at rect
-        self.painter = QPainter(self)
-        self.painter.setRenderHint(QPainter.TextAntialiasing)
-        self.painter.setPen(color)
-        font.setPointSizeF(abs(pos[3]) * scale)
-        self.painter.setFont(font)
-        self.painter.drawText(rect, Qt.AlignHCenter | Qt.AlignVCenter, text)
-        self.painter.end()
+        # rasterize the label once and draw it as a sprite centered in the rect
+        ratio = self.devicePixelRatioF()
+        pixel_size = max(1, round(abs(pos[3]) * scale * self.logicalDpiY() / 72. * ratio))
+        label = self.labels.get(text, font, pixel_size, color)
+        x = (pos[0] + pos[2] / 2.) / self.width() * 2. - 1.
+        y = 1. - (pos[1] + pos[3] / 2.) / self.height() * 2.
+        w = label.width() / ratio / self.width()
+        h = label.height() / ratio / self.height()
+        self.batch.add(label.textureId(), (x - w, y - h, x + w, y + h), label.uv)
+
+    def stageChanged(self):
+        # the rocket ascent during break and the blinking cue outline are animated, everything else is static
+        self.repaint_scheduler.stageChanged(self.protocol is not None and self.protocol.animated[self.stage_index])
+
+    def loadProtocol(self, scene, protocol):
+        self.scene = scene
+        self.protocol = protocol
+        self.column_sprites = protocol.column_sprites
+        self.column_labels = protocol.column_labels
+        if scene == GAME_SCENE:
+            # every game counts its own score
+            self.current_score = 0
+            self.current_task = -1
+        self.frame_stats.reset()
+        self.onset_audit.reset(len(protocol))
+        self.enterStage(0)
+
+    def enterStage(self, index):
+        # makes row index of the protocol the current stage
+        protocol = self.protocol
+        self.stage_index = index
+        self.stage = protocol.names[index]
+        self.stage_kind = kind = protocol.kinds[index]
+        self.stage_column = protocol.columns[index]
+        self.stage_labels = protocol.labels[index]
+        if protocol.markers[index] is not None:
+            self.pushStageMarker(protocol.markers[index])
+        if kind == BASELINE_CUE:
+            self.cue_text = protocol.texts[index]
+        elif kind == CUE_REST:
+            self.current_trial = protocol.trial_numbers[index]
+            self.ui.trial_label.setText(protocol.trial_texts[self.current_trial])
+        elif kind == REST:
+            # the labels of the upcoming task are warmed up by recordFrame once the rest frame is swapped
+            self.warm_up_pending = True
+        elif kind == CUE_TASK:
+            if self.scene == GAME_SCENE:
+                self.current_task = -1
+        elif kind == TASK:
+            self.rockets.reset()
+        elif kind == BREAK:
+            if self.scene == GAME_SCENE:
+                print('current task =', self.current_task)
+                if self.current_task == self.stage_column:
+                    self.current_score += 1
+                    self.ui.score_label.setText(protocol.score_texts[self.current_score])
 
-    def startBaseline(self, parent):
-        self.ui = parent.ui
+    def warmUpStage(self):
+        if self.protocol is not None:
+            self.prefetchTextures(self.protocol.tasks)
 
-        #self.stream_info = StreamInfo(self.ui.lsl_marker_outlet_lineEdit.text(), 'Markers', 1, 0, 'string', 'bci_hoops')
-        #self.stream_outlet = StreamOutlet(self.stream_info)
-        #print("LSL Marker Outlet Stream Initialized")
+    def startSession(self, scene, protocol):
         for i in range(3):
-            self.stream_outlet.push_sample(['initialize baseline'])
-
-        self.scene = 'baseline'
-        self.stage = 'cue'
-        self.stream_outlet.push_sample(['cue'])
-        self.cue_remaining_time = self.baseline_cue_duration
-        self.cue_text = 'Starting in %d...' % self.cue_remaining_time
-        self.timer.timeout.connect(self.baseline_timer_timeout)
-        self.timer.start(1000)
-
-    def baseline_timer_timeout(self):
-        self.cue_remaining_time -= 1
-        self.cue_text = 'Starting in %d...' % self.cue_remaining_time
-        if self.cue_remaining_time == 0:
-            self.timer.stop()
-            self.timer.timeout.disconnect(self.baseline_timer_timeout)
-            self.stream_outlet.push_sample(['baseline'])
-            self.stage = 'fixation'
-            self.timer.timeout.connect(self.stop)
-            self.timer.start(self.baseline_duration * 1000)
-        self.update()
+            self.stream_outlet.push_sample(['initialize %s' % SCENE_NAMES[scene]])
+        self.pause_requested = self.ui.btn_pause.text() != 'Pause'
+        self.loadProtocol(scene, protocol)
+        if protocol.tasks:
+            self.prefetchTextures(protocol.tasks)
+        self.scheduler.timeout.connect(self.protocol_timer_timeout)
+        self.scheduler.start(protocol.durations[0])
+        self.stageChanged()
+
+    def generateTrials(self):
+        num_trials = int(self.ui.num_trials_lineEdit.text())
+        trials = [0,1,2] * math.ceil(num_trials / 3)
+        trials = trials[:num_trials]
+        random.shuffle(trials)
+        print('trials: ', trials)
+        return trials
+
+    def startBaseline(self, parent):
+        self.ui = parent.ui
+        self.startSession(BASELINE_SCENE, compileBaseline(self.baseline_cue_duration, self.baseline_duration))
 
     def startTraining(self, parent):
         self.ui = parent.ui
 
-        # get tasks
+        # get tasks and generate randomized trials
         self.tasks = [self.ui.task1_comboBox.currentText(), self.ui.task2_comboBox.currentText(), self.ui.task3_comboBox.currentText()]
-
-        # generate randomized trials
-        num_trials = int(self.ui.num_trials_lineEdit.text())
-        self.trials = [0,1,2] * math.ceil(num_trials / 3)
-        self.trials = self.trials[:num_trials]
-        random.shuffle(self.trials)
-        print('trials: ', self.trials)
-        self.current_trial = 0
-        self.ui.trial_label.setText('Trial: %d / %d' % (self.current_trial + 1, len(self.trials)))
+        self.trials = self.generateTrials()
         self.ui.score_label.setText('')
-
-        if 'Subtraction - Simple' in self.tasks:
-            self.num_start_simple = random.randint(51, 100)
-            self.num_subtract_simple = random.randint(3,10)
-        if 'Subtraction - Complex' in self.tasks:
-            self.num_start_complex = random.randint(100, 200)
-            self.num_subtract_complex = random.randint(3,10)
-        if 'Word Generation' in self.tasks:
-            self.word = random.choice(self.word_categories)
-
-        #self.stream_info = StreamInfo(self.ui.lsl_marker_outlet_lineEdit.text(), 'Markers', 1, 0, 'string', 'bci_hoops')
-        #self.stream_outlet = StreamOutlet(self.stream_info)
-        #print("LSL Marker Outlet Stream Initialized")
-        for i in range(3):
-            self.stream_outlet.push_sample(['initialize training'])
-
-        self.scene = 'training'
-        self.stage = 'cue_rest'
-        self.stream_outlet.push_sample([self.stage])
-        self.timer.timeout.connect(self.training_timer_timeout)
-        self.timer.start(self.cue_duration * 1000)
-
-    def training_timer_timeout(self):
-        self.timer.stop()
-        self.update_timer.stop()
-        print("Current stage: ", self.stage, end='\t')
-        if self.stage == 'cue_rest':
-            # cue_rest -> rest
-            self.stage = 'rest'
-            self.stream_outlet.push_sample([self.stage])
-            self.timer.start(self.task_duration * 1000)
-        elif self.stage == 'rest':
-            # rest -> cue task
-            if self.tasks[self.trials[self.current_trial]] == 'Subtraction - Simple':
-                self.num_start_simple = random.randint(51, 100)
-                self.num_subtract_simple = random.randint(3,10)
-            elif self.tasks[self.trials[self.current_trial]] == 'Subtraction - Complex':
-                self.num_start_complex = random.randint(100, 200)
-                self.num_subtract_complex = random.randint(3,10)
-            elif self.tasks[self.trials[self.current_trial]] == 'Word Generation':
-                self.word = random.choice(self.word_categories)
-            self.stage = 'cue_{}'.format(self.tasks[self.trials[self.current_trial]])
-            self.stream_outlet.push_sample(['cue_label_{}_name_{}'.format(self.trials[self.current_trial], self.tasks[self.trials[self.current_trial]])])
-            self.timer.start(self.cue_duration * 1000)
-            self.update_timer.start()
-        elif self.stage == 'cue_{}'.format(self.tasks[self.trials[self.current_trial]]):
-            # cue task -> task
-            self.stage = self.tasks[self.trials[self.current_trial]]
-            self.stream_outlet.push_sample(['label_{}_name_{}'.format(self.trials[self.current_trial], self.tasks[self.trials[self.current_trial]])])
-            self.timer.start(self.task_duration * 1000)
-            self.update_timer.start()
-            self.rocket_positions = np.array([[-0.5,0], [0,0], [0.5, 0]])
-        elif self.stage == self.tasks[self.trials[self.current_trial]]:
-            # task -> break
-            self.stage = 'break'
-            self.stream_outlet.push_sample([self.stage])
-            self.timer.start(self.break_duration * 1000)
-            self.update_timer.start()
-        elif self.stage == 'break':
-            # break -> Pause/cue rest
-            if self.ui.btn_pause.text() == 'Pause':
-                self.current_trial += 1
-                self.ui.trial_label.setText('Trial: %d / %d' % (self.current_trial + 1, len(self.trials)))
-                if self.current_trial < len(self.trials):
-                    self.stage = 'cue_rest'
-                    self.stream_outlet.push_sample([self.stage])
-                    self.timer.start(self.cue_duration * 1000)
-                else:
-                    self.stop()
-            elif self.ui.btn_pause.text() == 'Pausing...':
-                self.ui.btn_pause.setText('Resume')
-                self.timer.start(16)
-            elif self.ui.btn_pause.text() == 'Resume':
-                self.timer.start(16)
-        print("Next state : ", self.stage)
-        self.update()
+        protocol = compileTrials(self.tasks, self.trials, self.cue_duration, self.task_duration, self.break_duration, self.word_categories)
+        self.startSession(TRAINING_SCENE, protocol)
 
     def startGame(self, parent):
         self.ui = parent.ui
 
-        # get tasks
+        # get tasks and generate randomized trials
         self.tasks = [self.ui.task1_comboBox.currentText(), self.ui.task2_comboBox.currentText(), self.ui.task3_comboBox.currentText()]
-
-        # generate randomized trials
-        num_trials = int(self.ui.num_trials_lineEdit.text())
-        self.trials = [0,1,2] * math.ceil(num_trials / 3)
-        self.trials = self.trials[:num_trials]
-        random.shuffle(self.trials)
-        print('trials: ', self.trials)
-        self.current_trial = 0
-        self.current_score = 0
-        self.ui.trial_label.setText('Trial: %d / %d' % (self.current_trial + 1, len(self.trials)))
-        self.ui.score_label.setText('Score: %d / %d' % (self.current_score, len(self.trials)))
-
-        if 'Subtraction - Simple' in self.tasks:
-            self.num_start_simple = random.randint(51, 100)
-            self.num_subtract_simple = random.randint(3,10)
-        if 'Subtraction - Complex' in self.tasks:
-            self.num_start_complex = random.randint(100, 200)
-            self.num_subtract_complex = random.randint(3,10)
-        if 'Word Generation' in self.tasks:
-            self.word = random.choice(self.word_categories)
+        self.trials = self.generateTrials()
+        protocol = compileTrials(self.tasks, self.trials, self.cue_duration, self.task_duration, self.break_duration, self.word_categories)
+        self.ui.score_label.setText(protocol.score_texts[0])
 
         # LSL
         pred = "name='%s'" % (self.ui.lsl_prediction_inlet_lineEdit.text())
@@ -579,76 +495,32 @@ class OGLWidget(QOpenGLWidget):
         else:
             self.ui.lsl_stream_label.setText('')
             self.lsl_pull_timer.start()
-            
-        #self.stream_info = StreamInfo(self.ui.lsl_marker_outlet_lineEdit.text(), 'Markers', 1, 0, 'string', 'bci_hoops')
-        #self.stream_outlet = StreamOutlet(self.stream_info)
-        #print("LSL Marker Outlet Stream Initialized")
-        for i in range(3):
-            self.stream_outlet.push_sample(['initialize game'])
 
-        self.current_task = -1
-        self.scene = 'game'
-        self.stage = 'cue_rest'
-        self.stream_outlet.push_sample([self.stage])
-        self.timer.timeout.connect(self.game_timer_timeout)
-        self.timer.start(self.cue_duration * 1000)
-
-    def game_timer_timeout(self):
-        self.timer.stop()
-        self.update_timer.stop()
-        if self.stage == 'cue_rest':
-            self.stage = 'rest'
-            self.stream_outlet.push_sample([self.stage])
-            self.timer.start(self.task_duration * 1000)
-        elif self.stage == 'rest':
-            if self.tasks[self.trials[self.current_trial]] == 'Subtraction - Simple':
-                self.num_start_simple = random.randint(51, 100)
-                self.num_subtract_simple = random.randint(3,10)
-            elif self.tasks[self.trials[self.current_trial]] == 'Subtraction - Complex':
-                self.num_start_complex = random.randint(100, 200)
-                self.num_subtract_complex = random.randint(3,10)
-            elif self.tasks[self.trials[self.current_trial]] == 'Word Generation':
-                self.word = random.choice(self.word_categories)
-            self.current_task = -1
-            self.stage = 'cue_{}'.format(self.tasks[self.trials[self.current_trial]])
-            self.stream_outlet.push_sample(['cue_label_{}_name_{}'.format(self.trials[self.current_trial], self.tasks[self.trials[self.current_trial]])])
-            self.timer.start(self.cue_duration * 1000)
-            self.update_timer.start()
-        elif self.stage == 'cue_{}'.format(self.tasks[self.trials[self.current_trial]]):
-            self.stage = self.tasks[self.trials[self.current_trial]]
-            self.stream_outlet.push_sample(['label_{}_name_{}'.format(self.trials[self.current_trial], self.tasks[self.trials[self.current_trial]])])
-            self.timer.start(self.task_duration * 1000)
-            self.update_timer.start()
-            self.rocket_positions = np.array([[-0.5,0], [0,0], [0.5, 0]])
-        elif self.stage == self.tasks[self.trials[self.current_trial]]:
-            if (not self.stream_inlet) or (self.stream_inlet and self.current_task != -1):
-                self.stage = 'break'
-                self.stream_outlet.push_sample([self.stage])
-                self.timer.start(self.break_duration * 1000)
-                self.update_timer.start()
-
-                print('current task = %d' % self.current_task)
-                if self.current_task == self.trials[self.current_trial]:
-                    self.current_score += 1
-                    self.ui.score_label.setText('Score: %d / %d' % (self.current_score, len(self.trials)))
-            elif self.stream_inlet and (self.current_task == -1):
-                self.timer.start(16)
-        elif self.stage == 'break':
-            if self.ui.btn_pause.text() == 'Pause':
-                self.current_trial += 1
-                self.ui.trial_label.setText('Trial: %d / %d' % (self.current_trial + 1, len(self.trials)))
-                if self.current_trial < len(self.trials):
-                    self.stage = 'cue_rest'
-                    self.stream_outlet.push_sample([self.stage])
-                    self.timer.start(self.cue_duration * 1000)
-                else:
-                    self.stop()
-            elif self.ui.btn_pause.text() == 'Pausing...':
-                self.ui.btn_pause.setText('Resume')
-                self.timer.start(16)
-            elif self.ui.btn_pause.text() == 'Resume':
-                self.timer.start(16)
-        self.update()
+        self.startSession(GAME_SCENE, protocol)
+
+    def protocol_timer_timeout(self):
+        # the current stage has ended, waits hold the scheduler until their signal resumes it
+        kind = self.stage_kind
+        if kind == BREAK and self.pause_requested:
+            self.ui.btn_pause.setText('Resume')
+            self.paused = True
+            self.scheduler.hold()
+            return
+        if kind == TASK and self.scene == GAME_SCENE and self.stream_inlet and self.current_task == -1:
+            self.waiting_for_prediction = True
+            self.scheduler.hold()
+            return
+        index = self.stage_index + 1
+        if index == len(self.protocol):
+            self.stop()
+            return
+        if self.scene == TRAINING_SCENE:
+            print("Current stage: ", self.stage, end='\t')
+        self.enterStage(index)
+        if self.scene == TRAINING_SCENE:
+            print("Next state : ", self.stage)
+        self.scheduler.next(self.protocol.durations[index])
+        self.stageChanged()
 
     def selectTask(self, taskNum):
         try:
@@ -659,6 +531,19 @@ class OGLWidget(QOpenGLWidget):
             return
         self.current_task = taskNum
         print('task = %d' % self.current_task)
+        self.task_selected.emit(taskNum)
+
+    def taskSelected(self, task):
+        if self.waiting_for_prediction:
+            self.waiting_for_prediction = False
+            self.scheduler.resume()
+
+    def setPauseRequested(self, requested):
+        # from the pause button, a paused session continues right away when the pause is released
+        self.pause_requested = requested
+        if self.paused and not requested:
+            self.paused = False
+            self.scheduler.resume()
 
     def pull_lsl(self):
         if self.stream_inlet:
@@ -671,11 +556,19 @@ class OGLWidget(QOpenGLWidget):
                 self.selectTask(sample[0][pred_index+len(pred_substr):])
 
     def stop(self):
-        self.timer.stop()
+        self.scheduler.stop()
+        self.warm_up_pending = False
+        self.paused = False
+        self.waiting_for_prediction = False
         self.lsl_pull_timer.stop()
         try:
-            self.timer.timeout.disconnect()
+            self.scheduler.timeout.disconnect()
         except:
             pass
-        self.update_timer.stop()
+        if self.scheduler.late_count:
+            print('%d late stage transitions, at most %.1f ms' % (self.scheduler.late_count, self.scheduler.max_lateness * 1000))
+        self.repaint_scheduler.stop()
+        self.flushMarkers()
+        self.writeSessionLogs()
         self.ui.stackedWidget.setCurrentWidget(self.ui.home_page)
+        self.session_stopped.emit()
@@ -0,0 +1,69 @@
+import numpy as np
+import json
+
+class OnsetAudit:
+    # planned onset, timer callback time and presentation time of every stage transition of a session,
+    # on the local_clock() timebase. rows are preallocated for the session and presentation times are
+    # filled in order as the frames showing the transitions are swapped
+    PLANNED, CALLBACK, PRESENTED = range(3)
+
+    def __init__(self, capacity=1024):
+        self.times = np.empty((capacity, 3))
+        self.stages = np.empty(capacity, dtype=np.int32)
+        self.reset()
+
+    def reset(self, capacity=0):
+        if capacity > len(self.times):
+            self.times = np.empty((capacity, 3))
+            self.stages = np.empty(capacity, dtype=np.int32)
+        self.times.fill(np.nan)
+        self.count = 0
+        self.presented_count = 0
+        self.stage_ids = {}
+        self.stage_names = []
+
+    def transition(self, stage, planned, callback):
+        if self.count == len(self.times):
+            # more transitions than planned for, e.g. after pauses
+            self.times = np.concatenate([self.times, np.full_like(self.times, np.nan)])
+            self.stages = np.concatenate([self.stages, np.empty_like(self.stages)])
+        stage_id = self.stage_ids.get(stage)
+        if stage_id is None:
+            stage_id = self.stage_ids[stage] = len(self.stage_names)
+            self.stage_names.append(stage)
+        self.times[self.count, self.PLANNED] = planned
+        self.times[self.count, self.CALLBACK] = callback
+        self.stages[self.count] = stage_id
+        self.count += 1
+
+    def presented(self, transitions, swap_time):
+        # the next transitions in order were shown by the frame swapped at swap_time
+        self.times[self.presented_count:self.presented_count + transitions, self.PRESENTED] = swap_time
+        self.presented_count += transitions
+
+    def summary(self):
+        times = self.times[:self.count]
+        callback_lateness = times[:, self.CALLBACK] - times[:, self.PLANNED]
+        presentation_lateness = times[:, self.PRESENTED] - times[:, self.PLANNED]
+        presented = presentation_lateness[~np.isnan(presentation_lateness)]
+        def describe(lateness):
+            if len(lateness) == 0:
+                return None
+            return {'mean_ms': float(lateness.mean() * 1000.), 'max_ms': float(lateness.max() * 1000.),
+                    'std_ms': float(lateness.std() * 1000.)}
+        return {
+            'transitions': int(self.count),
+            'presented': int(len(presented)),
+            'callback_lateness': describe(callback_lateness),
+            'presentation_lateness': describe(presented),
+            # how much later than planned the last onset was shown compared to the first
+            'cumulative_drift_ms': float((presented[-1] - presented[0]) * 1000.) if len(presented) else None,
+        }
+
+    def write(self, fname, **info):
+        summary = self.summary()
+        with open(fname, 'w') as f:
+            json.dump(dict(info, summary=summary, columns=['stage', 'planned', 'callback', 'presented'],
+                           transitions=[[self.stage_names[stage]] + [None if np.isnan(t) else float(t) for t in times]
+                                        for stage, times in zip(self.stages[:self.count], self.times[:self.count])]), f, indent=2)
+        return summary
@@ -0,0 +1,96 @@
+import random
+
+# scenes and stage kinds of a compiled protocol
+NO_SCENE, BASELINE_SCENE, TRAINING_SCENE, GAME_SCENE = range(4)
+SCENE_NAMES = ['', 'baseline', 'training', 'game']
+BASELINE_CUE, FIXATION, CUE_REST, REST, CUE_TASK, TASK, BREAK = range(7)
+
+# what a task column shows under its rocket: sprites as (name, center y, size) and an optional label
+# as (center y, size, text), the subtraction and word labels are drawn per trial
+TASK_PROMPTS = {
+    'Auditory Imagery': ([('music', -0.6, 0.3)], None),
+    'Facial Imagery - Celebrity': ([('face_celebrity', -0.65, 0.3)], (-0.4, [0.3, 0.3], 'Celebrity')),
+    'Facial Imagery - Family Member': ([('face_family', -0.65, 0.3)], (-0.4, [0.3, 0.3], 'Family member')),
+    'Motor Imagery - Foot': ([('foot', -0.6, 0.3)], None),
+    'Motor Imagery - Left Hand': ([('left_hand', -0.6, 0.4)], None),
+    'Motor Imagery - Right Hand': ([('right_hand', -0.6, 0.4)], None),
+    'Motor Imagery - Tongue': ([('tongue', -0.6, 0.3)], None),
+    'Shape Rotation - Cube': ([('cube', -0.6, 0.33)], None),
+    'Shape Rotation - Complex Shape': ([('complex_shape', -0.6, 0.4)], None),
+    'Subtraction - Simple': ([], (-0.6, [0.3, 0.3], None)),
+    'Subtraction - Complex': ([], (-0.6, [0.3, 0.3], None)),
+    'Word Generation': ([], (-0.6, [3, 0.3], None)),
+}
+
+def randomLabel(task, word_categories):
+    if task == 'Subtraction - Simple':
+        start, subtract = random.randint(51, 100), random.randint(3,10)
+    elif task == 'Subtraction - Complex':
+        start, subtract = random.randint(100, 200), random.randint(3,10)
+    else:
+        return 'Words: %s' % random.choice(word_categories)
+    return '%d - %d - %d = ?' % (start, subtract, subtract)
+
+class Protocol:
+    # a session compiled at its start: one row per stage onset in session order with its kind, name,
+    # LSL marker, duration, task column, trial and column labels. the timer callbacks step through the
+    # rows and the scenes draw from them, neither formats or compares strings
+    def __init__(self, tasks=(), trials=()):
+        self.tasks = list(tasks)
+        self.trials = list(trials)
+        self.kinds = []
+        self.names = []
+        self.markers = []
+        self.durations = []
+        self.columns = []
+        self.trial_numbers = []
+        self.labels = []
+        self.texts = []
+        self.animated = []
+        # per task column: sprites and label geometry
+        self.column_sprites = [TASK_PROMPTS[task][0] for task in self.tasks]
+        self.column_labels = [TASK_PROMPTS[task][1] for task in self.tasks]
+        self.trial_texts = ['Trial: %d / %d' % (i + 1, len(self.trials)) for i in range(len(self.trials))]
+        self.score_texts = ['Score: %d / %d' % (i, len(self.trials)) for i in range(len(self.trials) + 1)]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def add(self, kind, name, marker, duration, column=-1, trial=-1, labels=None, text=None):
+        self.kinds.append(kind)
+        self.names.append(name)
+        self.markers.append(marker)
+        self.durations.append(duration)
+        self.columns.append(column)
+        self.trial_numbers.append(trial)
+        self.labels.append(labels)
+        self.texts.append(text)
+        self.animated.append(kind == CUE_TASK or kind == BREAK)
+
+def compileBaseline(cue_duration, baseline_duration):
+    protocol = Protocol()
+    # the countdown text changes every second, only its start is marked
+    for remaining in range(cue_duration, 0, -1):
+        protocol.add(BASELINE_CUE, 'cue', 'cue' if remaining == cue_duration else None, 1, text='Starting in %d...' % remaining)
+    protocol.add(FIXATION, 'fixation', 'baseline', baseline_duration)
+    return protocol
+
+def compileTrials(tasks, trials, cue_duration, task_duration, break_duration, word_categories):
+    # cue_rest, rest, cue, task and break per trial. a subtraction or word label gets new values at the
+    # rest onset of its own trials, the other columns keep showing their last values
+    protocol = Protocol(tasks, trials)
+    labels = [label[2] if label else None for label in protocol.column_labels]
+    for column, task in enumerate(tasks):
+        if task in ['Subtraction - Simple', 'Subtraction - Complex', 'Word Generation']:
+            labels[column] = randomLabel(task, word_categories)
+    cue_names = ['cue_' + task for task in tasks]
+    for trial, column in enumerate(trials):
+        task = tasks[column]
+        protocol.add(CUE_REST, 'cue_rest', 'cue_rest', cue_duration, column, trial, tuple(labels))
+        if task in ['Subtraction - Simple', 'Subtraction - Complex', 'Word Generation']:
+            labels[column] = randomLabel(task, word_categories)
+        protocol.add(REST, 'rest', 'rest', task_duration, column, trial, tuple(labels))
+        protocol.add(CUE_TASK, cue_names[column], 'cue_label_{}_name_{}'.format(column, task), cue_duration, column, trial, protocol.labels[-1])
+        protocol.add(TASK, task, 'label_{}_name_{}'.format(column, task), task_duration, column, trial, protocol.labels[-1])
+        protocol.add(BREAK, 'break', 'break', break_duration, column, trial, protocol.labels[-1])
+    return protocol
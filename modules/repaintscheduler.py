@@ -0,0 +1,19 @@
+from PyQt5.QtCore import QObject
+from . frameloop import FrameLoop
+
+class RepaintScheduler(QObject):
+    # static stages are painted once per change, animated stages run on the vsync-locked frame loop
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.widget = widget
+        self.frame_loop = FrameLoop(widget)
+
+    def stageChanged(self, animated):
+        if animated:
+            self.frame_loop.start()
+        else:
+            self.frame_loop.stop()
+            self.widget.update()
+
+    def stop(self):
+        self.frame_loop.stop()
@@ -0,0 +1,29 @@
+import numpy as np
+
+class RocketAnimation:
+    # rocket heights follow from the time since launch, so the ascent looks the same at any frame rate.
+    # one rocket flies at a time, launching another one stops the previous rocket where it is
+    def __init__(self, columns=[-0.5, 0, 0.5], speed=1.2):
+        self.speed = speed  # viewport units per second, the old 0.02 per frame at 60 Hz
+        self.positions = np.zeros((len(columns), 2))
+        self.positions[:, 0] = columns
+        self.base_heights = np.zeros(len(columns))
+        self.launch_times = np.full(len(columns), np.nan)
+
+    def reset(self):
+        self.positions[:, 1] = 0
+        self.base_heights[:] = 0
+        self.launch_times[:] = np.nan
+
+    def launch(self, column, t):
+        if not np.isnan(self.launch_times[column]):
+            return
+        flying = ~np.isnan(self.launch_times)
+        self.base_heights[flying] += (t - self.launch_times[flying]) * self.speed
+        self.launch_times[flying] = np.nan
+        self.launch_times[column] = t
+
+    def update(self, t):
+        # fmax treats columns that have not launched (nan) as zero elapsed time
+        self.positions[:, 1] = self.base_heights + np.fmax(t - self.launch_times, 0.) * self.speed
+        return self.positions
@@ -0,0 +1,66 @@
+from OpenGL.GL import *
+import ctypes
+import numpy as np
+
+class SpriteBatch:
+    # columns of a sprite row: left, top, right, bottom, u0, v0, u1, v1, r, g, b, a
+    # each sprite expands into 4 quad corners of (x, y, u, v, r, g, b, a)
+    CORNERS = np.array([[0,1,4,5,8,9,10,11], [0,3,4,7,8,9,10,11], [2,3,6,7,8,9,10,11], [2,1,6,5,8,9,10,11]])
+    VERTEX_STRIDE = 8 * 4
+
+    def __init__(self, state, capacity=64):
+        self.state = state
+        self.sprites = np.zeros((capacity, 12), dtype=np.float32)
+        self.textures = np.zeros(capacity, dtype=np.uint32)
+        self.count = 0
+        self.vbo = None
+
+    def initializeGL(self):
+        self.vbo = glGenBuffers(1)
+
+    def add(self, texture_id, rect, uv=(0., 0., 1., 1.), tint=(1., 1., 1., 1.)):
+        if self.count == len(self.sprites):
+            self.sprites = np.concatenate([self.sprites, np.zeros_like(self.sprites)])
+            self.textures = np.concatenate([self.textures, np.zeros_like(self.textures)])
+        self.sprites[self.count, :4] = rect
+        self.sprites[self.count, 4:8] = uv
+        self.sprites[self.count, 8:] = tint
+        self.textures[self.count] = texture_id
+        self.count += 1
+
+    def textureRuns(self):
+        # split the batch into runs of sprites sharing a texture, keeping draw order
+        textures = self.textures[:self.count]
+        breaks = np.flatnonzero(textures[1:] != textures[:-1]) + 1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [self.count]])
+        return zip(textures[starts], starts, ends)
+
+    def flush(self):
+        if self.count == 0:
+            return
+        vertices = np.ascontiguousarray(self.sprites[:self.count][:, self.CORNERS])
+
+        # state is only set on the first flush of a frame, later flushes skip the no-op transitions
+        state = self.state
+        state.bindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        state.enableClientState(GL_VERTEX_ARRAY)
+        state.enableClientState(GL_TEXTURE_COORD_ARRAY)
+        state.enableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(2, GL_FLOAT, self.VERTEX_STRIDE, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, self.VERTEX_STRIDE, ctypes.c_void_p(8))
+        glColorPointer(4, GL_FLOAT, self.VERTEX_STRIDE, ctypes.c_void_p(16))
+        state.count(4)
+
+        state.disable(GL_DEPTH_TEST)
+        state.depthMask(GL_FALSE)
+        state.enable(GL_BLEND)
+        state.blendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.enable(GL_TEXTURE_2D)
+
+        for texture, start, end in self.textureRuns():
+            state.bindTexture(int(texture))
+            glDrawArrays(GL_QUADS, int(start) * 4, int(end - start) * 4)
+            state.count()
+        self.count = 0
@@ -0,0 +1,154 @@
+from PyQt5.QtCore import QObject, QThread, QTimer, QCoreApplication, Qt, pyqtSignal
+from pylsl import local_clock
+import threading, time
+
+class StageScheduler(QObject):
+    # emits timeout at absolute deadlines on the local_clock() timebase. next(delay) counts from the
+    # previous deadline instead of from the callback, so timer latency does not add up over a session.
+    # a late transition is reported through late and the following deadlines keep their planned onsets
+    timeout = pyqtSignal()
+    late = pyqtSignal(float, float)  # deadline, lateness in seconds
+
+    def __init__(self, parent=None, late_threshold=0.002):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.fire)
+        self.late_threshold = late_threshold
+        self.deadline = None
+        self.waiting = False
+        self.fire_time = None
+        self.firing = False
+        self.late_count = 0
+        self.max_lateness = 0.
+
+    def start(self, delay):
+        # first deadline of a session
+        self.late_count = 0
+        self.max_lateness = 0.
+        self.arm(local_clock() + delay)
+
+    def next(self, delay):
+        self.arm(self.deadline + delay)
+
+    def hold(self):
+        # a wait without a planned end (pause, prediction), ended by resume(). the next deadline
+        # counts from the transition that ends it
+        self.timer.stop()
+        self.waiting = True
+
+    def resume(self):
+        if self.waiting:
+            self.fire()
+
+    def arm(self, deadline):
+        self.waiting = False
+        self.deadline = deadline
+        self.timer.start(max(0, int((deadline - local_clock()) * 1000)))
+
+    def stop(self):
+        self.timer.stop()
+
+    def fire(self):
+        now = local_clock()
+        if self.waiting:
+            self.deadline = now
+        elif now < self.deadline:
+            # the timer has millisecond resolution and may fire early, wait for the rest. a sub-millisecond
+            # remainder is waited out with 0 ms timers, a transition never comes before its deadline
+            self.timer.start(int((self.deadline - now) * 1000))
+            return
+        else:
+            lateness = now - self.deadline
+            self.max_lateness = max(self.max_lateness, lateness)
+            if lateness > self.late_threshold:
+                self.late_count += 1
+                self.late.emit(self.deadline, lateness)
+        self.fire_time = now
+        # transitions made by the callbacks can look up deadline and fire_time while firing is set
+        self.firing = True
+        try:
+            self.timeout.emit()
+        finally:
+            self.firing = False
+
+class TimingThread(QThread):
+    # sleeps until spin_margin before the armed deadline and spins on local_clock() for the rest,
+    # then reports the deadline with the generation it was armed with
+    deadline_reached = pyqtSignal(int)
+
+    def __init__(self, spin_margin=0.002):
+        super().__init__()
+        self.spin_margin = spin_margin
+        self.condition = threading.Condition()
+        self.deadline = None
+        self.generation = 0
+        self.running = True
+
+    def arm(self, deadline):
+        with self.condition:
+            self.deadline = deadline
+            self.generation += 1
+            self.condition.notify()
+            return self.generation
+
+    def disarm(self):
+        with self.condition:
+            self.deadline = None
+            self.generation += 1
+            self.condition.notify()
+            return self.generation
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.deadline is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                remaining = self.deadline - local_clock() - self.spin_margin
+                if remaining > 0:
+                    # woken early by arm() or disarm(), or at the margin, check again
+                    self.condition.wait(remaining)
+                    continue
+                deadline, generation = self.deadline, self.generation
+                self.deadline = None
+            while local_clock() < deadline:
+                # give the GIL to the GUI thread while spinning
+                time.sleep(0)
+            self.deadline_reached.emit(generation)
+
+class ThreadedStageScheduler(StageScheduler):
+    # same as StageScheduler, but the deadlines are kept by a time-critical TimingThread instead of a QTimer,
+    # the transition is posted to the GUI thread as soon as the deadline is reached
+    def __init__(self, parent=None, late_threshold=0.002, spin_margin=0.002):
+        super().__init__(parent, late_threshold)
+        self.generation = 0
+        self.timing_thread = TimingThread(spin_margin)
+        self.timing_thread.deadline_reached.connect(self.deadlineReached)
+        self.timing_thread.start(QThread.TimeCriticalPriority)
+        QCoreApplication.instance().aboutToQuit.connect(self.timing_thread.stop)
+
+    def arm(self, deadline):
+        self.waiting = False
+        self.deadline = deadline
+        self.generation = self.timing_thread.arm(deadline)
+
+    def hold(self):
+        self.generation = self.timing_thread.disarm()
+        self.waiting = True
+
+    def stop(self):
+        self.generation = self.timing_thread.disarm()
+
+    def deadlineReached(self, generation):
+        # deadlines re-armed or stopped in the meantime are stale
+        if generation == self.generation:
+            self.fire()
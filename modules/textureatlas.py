@@ -0,0 +1,102 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPainter, QOpenGLTexture
+
+class AtlasSprite:
+    # sub-rectangle of an atlas page, exposes the same width/height/textureId as a QOpenGLTexture
+    def __init__(self, page, x, y, width, height, page_width, page_height):
+        self.page = page
+        self.x = x
+        self.y = y
+        self.w = width
+        self.h = height
+        self.uv = (x / page_width, y / page_height, (x + width) / page_width, (y + height) / page_height)
+
+    def width(self):
+        return self.w
+
+    def height(self):
+        return self.h
+
+    def textureId(self):
+        return self.page.textureId()
+
+class TextureAtlas:
+    def __init__(self, max_size=4096, padding=8, mip_levels=3):
+        # gutters of 2**mip_levels texels keep sprites from bleeding into each other down to the last mip level
+        self.max_size = max_size
+        self.padding = padding
+        self.mip_levels = mip_levels
+        self.alignment = 2 ** mip_levels
+        self.pages = []
+        self.names = []
+        self.nbytes = 0
+
+    def align(self, value):
+        return -(-value // self.alignment) * self.alignment
+
+    def pack(self, sizes):
+        # shelf packing, tallest images first
+        # returns {name: (page_index, x, y)} and the used [width, height] of each page
+        placements = {}
+        extents = [[0, 0]]
+        x, y, shelf_height = 0, 0, 0
+        for name in sorted(sizes, key=lambda n: sizes[n][1], reverse=True):
+            # keep a transparent gutter around every image so linear filtering does not bleed
+            w = self.align(sizes[name][0] + 2 * self.padding)
+            h = self.align(sizes[name][1] + 2 * self.padding)
+            if w > self.max_size or h > self.max_size:
+                raise ValueError('Image %s (%dx%d) does not fit in a %d atlas' % (name, sizes[name][0], sizes[name][1], self.max_size))
+            if x + w > self.max_size:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            if y + h > self.max_size:
+                x, y, shelf_height = 0, 0, 0
+                extents.append([0, 0])
+            placements[name] = (len(extents) - 1, x + self.padding, y + self.padding)
+            extents[-1][0] = max(extents[-1][0], x + w)
+            extents[-1][1] = max(extents[-1][1], y + h)
+            x += w
+            shelf_height = max(shelf_height, h)
+        return placements, extents
+
+    def build(self, images):
+        # images = {name: QImage}, already mirrored for OpenGL
+        placements, extents = self.pack({name: (im.width(), im.height()) for name, im in images.items()})
+
+        page_images = []
+        for width, height in extents:
+            page_image = QImage(width, height, QImage.Format_RGBA8888)
+            page_image.fill(Qt.transparent)
+            page_images.append(page_image)
+        painter = QPainter()
+        for index, page_image in enumerate(page_images):
+            painter.begin(page_image)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            for name, (page, x, y) in placements.items():
+                if page == index:
+                    painter.drawImage(x, y, images[name])
+            painter.end()
+
+        self.pages = []
+        self.names = list(images)
+        self.nbytes = 0
+        for page_image in page_images:
+            # RGBA8 plus a third for the mipmap chain
+            self.nbytes += page_image.width() * page_image.height() * 4 * 4 // 3
+            # trilinear minification, the mipmap chain is generated on upload
+            page = QOpenGLTexture(page_image, QOpenGLTexture.GenerateMipMaps)
+            page.setMipMaxLevel(self.mip_levels)
+            page.setMinificationFilter(QOpenGLTexture.LinearMipMapLinear)
+            page.setMagnificationFilter(QOpenGLTexture.Linear)
+            page.setWrapMode(QOpenGLTexture.ClampToEdge)
+            self.pages.append(page)
+
+        sprites = {}
+        for name, (page, x, y) in placements.items():
+            sprites[name] = AtlasSprite(self.pages[page], x, y, images[name].width(), images[name].height(), extents[page][0], extents[page][1])
+        return sprites
+
+    def destroy(self):
+        for page in self.pages:
+            page.destroy()
+        self.pages = []
+        self.nbytes = 0
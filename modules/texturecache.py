@@ -0,0 +1,84 @@
+from PyQt5.QtGui import QImage
+from PyQt5 import sip
+import os, json, hashlib, threading, mmap, struct, ctypes
+
+class TextureCache:
+    # decoded, mirrored RGBA8888 images kept on disk and memory-mapped on load.
+    # blobs are keyed by the content hash of the source file and the decoded size,
+    # the index remembers the hash of each file for its size and mtime so unchanged files are not re-read.
+    # load() may be called from several threads
+    MAGIC = b'BCIR'
+    HEADER_SIZE = 16
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        try:
+            with open(self.index_file, 'r') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        self.maps = {}
+        self.lock = threading.Lock()
+
+    def contentHash(self, fname):
+        stat = os.stat(fname)
+        with self.lock:
+            entry = self.index.get(fname)
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['hash']
+        with open(fname, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        with self.lock:
+            if entry and entry['hash'] != digest:
+                # the asset changed, drop the blobs decoded from the old content
+                for blob in os.listdir(self.cache_dir):
+                    if blob.startswith(entry['hash']):
+                        os.remove(os.path.join(self.cache_dir, blob))
+            self.index[fname] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest}
+            self.saveIndex()
+        return digest
+
+    def saveIndex(self):
+        tmp = self.index_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_file)
+
+    def load(self, fname, width, height, decode):
+        # decode() is only called on a cache miss and must return a mirrored width x height QImage
+        os.makedirs(self.cache_dir, exist_ok=True)
+        blob = os.path.join(self.cache_dir, '%s_%dx%d.rgba' % (self.contentHash(fname), width, height))
+        if os.path.isfile(blob):
+            image = self.map(blob)
+            if image is not None:
+                return image
+        image = decode().convertToFormat(QImage.Format_RGBA8888)
+        self.store(blob, image)
+        return image
+
+    def map(self, blob):
+        if os.path.getsize(blob) < self.HEADER_SIZE:
+            return None
+        with open(blob, 'rb') as f:
+            # copy-on-write mapping, pages are private and only read from disk when touched
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        if data[:4] != self.MAGIC:
+            return None
+        width, height, bytes_per_line = struct.unpack_from('<III', data, 4)
+        if len(data) != self.HEADER_SIZE + height * bytes_per_line:
+            return None
+        # the QImage wraps the mapped pages without copying, keep the map alive as long as the cache
+        pixels = ctypes.c_char.from_buffer(data, self.HEADER_SIZE)
+        self.maps[blob] = (data, pixels)
+        return QImage(sip.voidptr(ctypes.addressof(pixels)), width, height, bytes_per_line, QImage.Format_RGBA8888)
+
+    def store(self, blob, image):
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        header = self.MAGIC + struct.pack('<III', image.width(), image.height(), image.bytesPerLine())
+        tmp = blob + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            f.write(bytes(bits))
+        os.replace(tmp, blob)
@@ -0,0 +1,66 @@
+from . textureatlas import TextureAtlas
+
+class TextureManager:
+    # name -> atlas sprite lookup that uploads sprites on demand. a prefetch packs all sprites of the
+    # session into one atlas, so a frame binds a single texture, and repacks them when the set changes.
+    # sprites moved to a newer atlas are dropped from the old one, atlases without a required sprite are
+    # evicted over budget
+    def __init__(self, load_images, budget=64 * 1024 * 1024):
+        # load_images(names) returns {name: QImage} of mirrored images
+        self.load_images = load_images
+        self.budget = budget
+        self.max_size = 4096
+        self.atlases = []
+        self.sprites = {}
+        self.required = set()
+
+    def __getitem__(self, name):
+        sprite = self.sprites.get(name)
+        if sprite is None:
+            # not prefetched, upload it on its own rather than failing the frame
+            self.upload([name])
+            sprite = self.sprites[name]
+        return sprite
+
+    def __contains__(self, name):
+        return name in self.sprites
+
+    def keys(self):
+        return self.sprites.keys()
+
+    def nbytes(self):
+        return sum(atlas.nbytes for atlas in self.atlases)
+
+    def prefetch(self, names):
+        self.required = set(names)
+        if not any(self.required.issubset(atlas.names) for atlas in self.atlases):
+            self.upload(list(dict.fromkeys(names)))
+        self.evict()
+
+    def upload(self, names):
+        atlas = TextureAtlas(self.max_size)
+        self.sprites.update(atlas.build(self.load_images(names)))
+        for old in self.atlases:
+            old.names = [name for name in old.names if name not in atlas.names]
+            if not old.names:
+                old.destroy()
+        self.atlases = [old for old in self.atlases if old.names]
+        self.atlases.append(atlas)
+
+    def evict(self):
+        # oldest atlases first, never one holding a sprite the configured session needs
+        for atlas in list(self.atlases):
+            if self.nbytes() <= self.budget:
+                break
+            if self.required.isdisjoint(atlas.names):
+                for name in atlas.names:
+                    del self.sprites[name]
+                atlas.destroy()
+                self.atlases.remove(atlas)
+                print('Evicted textures: %s' % ', '.join(atlas.names))
+
+    def clear(self):
+        for atlas in self.atlases:
+            atlas.destroy()
+        self.atlases = []
+        self.sprites = {}